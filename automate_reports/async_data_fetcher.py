@@ -0,0 +1,416 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+import aiohttp
+from data_fetcher import APIHandler
+from retry_policy import RetryPolicy
+from telemetry import endpoint_name
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class AsyncAPIHandler:
+    """asyncio variant of APIHandler. All calls share one aiohttp session (one connection pool)
+    with a global and a per-host connection limit, so hundreds of requests can be in flight
+    without a thread per request."""
+
+    #######################################################################################################################################################################
+    #######################################################################################################################################################################
+
+    def __init__(self, api_handler=None, max_connections=100, max_connections_per_host=30):
+        # Reuse URLs, key, headers and pagination settings from the synchronous handler
+        config = api_handler or APIHandler()
+        self.config = config
+        self.BASE_ADMIN_URL = config.BASE_ADMIN_URL
+        self.BASE_METRICS_URL = config.BASE_METRICS_URL
+        self.BASE_ALARM_URL = config.BASE_ALARM_URL
+        self.headers = dict(config.headers)
+        self.PAGE_SIZE = config.PAGE_SIZE
+        self.PAGE_FANOUT = config.PAGE_FANOUT
+        self.ALARM_DETAIL_WORKERS = config.ALARM_DETAIL_WORKERS
+        self.LOG_VOLUME_BATCH_SIZE = config.LOG_VOLUME_BATCH_SIZE
+        self.LOG_VOLUME_SINGLE_REQUEST_DAYS = config.LOG_VOLUME_SINGLE_REQUEST_DAYS
+        self.LOG_VOLUME_WINDOW = config.LOG_VOLUME_WINDOW
+        self.LOG_VOLUME_WORKERS = config.LOG_VOLUME_WORKERS
+        self.LOG_VOLUME_WINDOW_RETRIES = config.LOG_VOLUME_WINDOW_RETRIES
+        self.retry_policies = config.retry_policies
+        self.CONNECT_TIMEOUT = config.CONNECT_TIMEOUT
+        self.READ_TIMEOUT = config.READ_TIMEOUT
+        self.rate_limiter = config.rate_limiter
+        self.telemetry = config.telemetry
+        self.snapshot_store = config.snapshot_store
+
+        # Concurrency limits - total open connections and open connections per host
+        self.MAX_CONNECTIONS = max_connections
+        self.MAX_CONNECTIONS_PER_HOST = max_connections_per_host
+        self.session = None
+
+    async def get_session(self):
+        """Return the shared session, creating it on first use (must be called inside the event loop)"""
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.MAX_CONNECTIONS, limit_per_host=self.MAX_CONNECTIONS_PER_HOST, ssl=False)
+            timeout = aiohttp.ClientTimeout(sock_connect=self.CONNECT_TIMEOUT, sock_read=self.READ_TIMEOUT)
+            self.session = aiohttp.ClientSession(headers=self.headers, connector=connector, timeout=timeout)
+            logging.info(f"Opened async connection pool (limit {self.MAX_CONNECTIONS}, per host {self.MAX_CONNECTIONS_PER_HOST})")
+        return self.session
+
+    async def close(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    async def __aenter__(self):
+        await self.get_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def request(self, base_url, endpoint, method='GET', params=None, family='admin'):
+        """Single code path for all API calls, retrying transient failures with the endpoint family's
+        RetryPolicy. Returns (json, None) or (None, error message)"""
+        if self.snapshot_store is not None and self.snapshot_store.replay:
+            return self.snapshot_store.get(family, method, endpoint, params)
+
+        url = f"{base_url}/{endpoint}"
+        policy = self.retry_policies.get(family) or self.retry_policies['admin']
+        label = endpoint_name(family, endpoint)
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            data, error_msg, body, retry_after, retryable = await self.request_once(url, method, params, label)
+            if error_msg is None:
+                if self.snapshot_store is not None:
+                    self.snapshot_store.record(family, method, endpoint, params, data)
+                return data, None
+
+            delay = policy.delay_for(attempt, retry_after, time.monotonic() - started) if retryable else None
+            if delay is None:
+                break
+
+            attempt += 1
+            self.telemetry.record_retry(label)
+            logging.warning(f"{error_msg} - retrying {url} in {delay:.1f}s (retry {attempt} of {policy.max_retries})")
+            await asyncio.sleep(delay)
+
+        self.telemetry.record_error(label)
+        logging.error(error_msg)
+        if body is not None:
+            logging.error("Response content: %s", body)
+
+        return None, error_msg
+
+    async def request_once(self, url, method, params, label=None):
+        """One HTTP attempt. Returns (json, error message, response body, Retry-After seconds, retryable)"""
+        body = None
+        retry_after = None
+
+        if self.rate_limiter is not None:
+            wait = self.rate_limiter.reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+        started = time.monotonic()
+        try:
+            logging.info(f"Making API call to {url}")
+            session = await self.get_session()
+            # Read the key on every call, like APIHandler
+            headers = self.config.auth_headers()
+            if method.upper() == 'GET':
+                request = session.get(url, params=params, headers=headers)
+            elif method.upper() == 'POST':
+                request = session.post(url, json=params, headers=headers)
+            else:
+                raise ValueError("Unsupported HTTP method")
+
+            async with request as response:
+                body = await response.read()
+                retry_after = RetryPolicy.parse_retry_after(response.headers.get('Retry-After'))
+                response.raise_for_status()
+                return await response.json(content_type=None), None, body, None, False
+        except aiohttp.ClientResponseError as e:
+            return None, f"HTTP Error: {e}", body, retry_after, e.status in RetryPolicy.RETRY_STATUS_CODES
+        except aiohttp.ClientConnectionError as e:
+            return None, f"Connection Error: {e}", body, None, True
+        except asyncio.TimeoutError as e:
+            return None, f"Timeout Error: {e}", body, None, True
+        except aiohttp.ClientError as e:
+            return None, f"Request Error: {e}", body, None, False
+        except ValueError as e:
+            return None, str(e), body, None, False
+        finally:
+            if label is not None:
+                self.telemetry.record_request(label, time.monotonic() - started, len(body) if body is not None else 0)
+
+    async def make_api_call(self, endpoint, method='GET', params=None):
+        return await self.request(self.BASE_ADMIN_URL, endpoint, method, params, family='admin')
+
+    async def make_metrics_api_call(self, endpoint, method='GET', params=None):
+        return await self.request(self.BASE_METRICS_URL, endpoint, method, params, family='metrics')
+
+    async def make_alarm_api_call(self, endpoint, method='GET', params=None):
+        return await self.request(self.BASE_ALARM_URL, endpoint, method, params, family='alarm')
+
+
+    #######################################################################################################################################################################
+    #######################################################################################################################################################################
+
+    async def fetch_page(self, api_call, base_endpoint, params, method, offset, data_key=None):
+        """Fetch one page at the given offset. Returns (batch, None), (None, None) for no response, or (None, error)"""
+        pagination_params = {'count': self.PAGE_SIZE, 'offset': offset, **params}
+        endpoint = f'{base_endpoint}?{urlencode(pagination_params)}' if method.upper() == 'GET' else base_endpoint
+        response, error = await api_call(endpoint, method, pagination_params if method.upper() == 'POST' else None)
+
+        if error:
+            return None, error
+        if not response:
+            return None, None
+        self.telemetry.record_page(endpoint_name(APIHandler.API_CALL_FAMILIES.get(api_call.__name__, 'admin'), base_endpoint))
+        if data_key:
+            return response.get(data_key, []), None
+        return response, None
+
+    async def paginate(self, api_call, base_endpoint, params, method='GET', data_key=None):
+        """Same paging rules as APIHandler.paginate, with each wave of offsets awaited together"""
+        all_data = []
+        count = params.get('count', self.PAGE_SIZE)
+        fanout = max(1, self.PAGE_FANOUT)
+
+        logging.info(f"Fetching data with pagination from {base_endpoint}")
+        offset = 0
+        wave = [await self.fetch_page(api_call, base_endpoint, params, method, offset, data_key)]
+        while True:
+            for data_batch, error in wave:
+                if error:
+                    logging.error(f"Error fetching data: {error}")
+                    return None, error
+
+                if not data_batch:
+                    if data_batch is None:
+                        logging.warning("No response received from API.")
+                    else:
+                        logging.warning("Data batch is empty or not present")
+                    return all_data, None
+
+                all_data.extend(data_batch)
+                offset += count
+
+                # Pagination check
+                if len(data_batch) < count:
+                    return all_data, None
+
+            wave = await asyncio.gather(*[
+                self.fetch_page(api_call, base_endpoint, params, method, offset + i * count, data_key)
+                for i in range(fanout)
+            ])
+
+    async def fetch_with_pagination(self, base_endpoint, params, method='GET'):
+        return await self.paginate(self.make_api_call, base_endpoint, params, method)
+
+    async def fetch_metrics_with_pagination(self, base_endpoint, params, method='GET'):
+        return await self.paginate(self.make_metrics_api_call, base_endpoint, params, method, data_key='data')
+
+    async def fetch_alarms_with_pagination(self, base_endpoint, params, method='GET'):
+        return await self.paginate(self.make_alarm_api_call, base_endpoint, params, method, data_key='alarmsSearchDetails')
+
+
+    #######################################################################################################################################################################
+    #######################################################################################################################################################################
+
+    async def fetch_entities(self):
+        logging.info(f"Fetching entities")
+        response, error = await self.fetch_with_pagination('entities/', {})
+        if error:
+            logging.error(f"Error fetching entities: {error}")
+            return None
+        return response
+
+    async def fetch_entity_log_source_overview(self, entityId):
+        logging.info(f"Fetching Log Sources")
+        response, error = await self.fetch_with_pagination('logsources/', APIHandler.log_source_params(entityId))
+        if error:
+            logging.error(f"Error fetching log sources: {error}")
+            return None
+        return response
+
+    async def fetch_entity_pending_log_sources(self):
+        logging.info(f"Fetching Pending Log Sources")
+        response, error = await self.fetch_with_pagination('logsources-request/', APIHandler.pending_log_source_params())
+        if error:
+            logging.error(f"Error fetching pending log sources: {error}")
+            return None
+        return response
+
+    async def fetch_entity_log_volume(self, entityId, days=7):
+        if days > self.LOG_VOLUME_SINGLE_REQUEST_DAYS:
+            today = datetime.now()
+            return (await self.fetch_log_volume_range([entityId], today - timedelta(days=days), today)).get(entityId)
+
+        logging.info(f"Fetching Log Volume for Entity ID: {entityId}")
+        response, error = await self.fetch_metrics_with_pagination('logvolume/', APIHandler.log_volume_params([entityId], days=days), method='POST')
+        if error:
+            logging.error(f"Error fetching log volume: {error}")
+            return None
+        return response
+
+    async def fetch_log_volume_for_entities_with_errors(self, entity_ids, batch_size=None, start=None, end=None):
+        """Same as APIHandler.fetch_log_volume_for_entities_with_errors: one logvolume/ request per batch of IDs,
+        returns ({entity ID: response or None}, {entity ID: error} for the entities whose request failed)"""
+        entity_ids = list(entity_ids)
+        batch_size = batch_size or self.LOG_VOLUME_BATCH_SIZE
+        log_volumes = {}
+        errors = {}
+        for offset in range(0, len(entity_ids), batch_size):
+            batch = entity_ids[offset:offset + batch_size]
+            logging.info(f"Fetching Log Volume for {len(batch)} entities")
+            response, error = await self.fetch_metrics_with_pagination('logvolume/', APIHandler.log_volume_params(batch, start=start, end=end), method='POST')
+            if error:
+                logging.error(f"Error fetching log volume: {error}")
+                log_volumes.update({entity_id: None for entity_id in batch})
+                errors.update({entity_id: error for entity_id in batch})
+                continue
+            log_volumes.update(APIHandler.split_log_volume_by_entity(response, batch))
+        return log_volumes, errors
+
+    async def fetch_log_volume_for_entities(self, entity_ids, batch_size=None, start=None, end=None):
+        log_volumes, _ = await self.fetch_log_volume_for_entities_with_errors(entity_ids, batch_size, start, end)
+        return log_volumes
+
+    async def fetch_log_volume_windows(self, window_entity_ids, max_workers=None):
+        """Fetch {(start, end) window: entity IDs} with at most max_workers windows in flight, retrying the
+        entities whose request failed per window. Returns {window: {entity ID: response or None}}"""
+        limit = asyncio.Semaphore(max_workers or self.LOG_VOLUME_WORKERS)
+        results = {window: {} for window in window_entity_ids}
+        pending = {window: list(entity_ids) for window, entity_ids in window_entity_ids.items() if entity_ids}
+
+        async def fetch(window):
+            async with limit:
+                return await self.fetch_log_volume_for_entities_with_errors(pending[window], start=window[0], end=window[1])
+
+        for attempt in range(self.LOG_VOLUME_WINDOW_RETRIES + 1):
+            if not pending:
+                break
+            if attempt:
+                logging.warning(f"Retrying {len(pending)} failed log volume windows (attempt {attempt + 1})")
+
+            fetched = await asyncio.gather(*[fetch(window) for window in pending])
+            failed = {}
+            for window, (log_volumes, errors) in zip(list(pending), fetched):
+                results[window].update(log_volumes)
+                if errors:
+                    failed[window] = list(errors)
+            pending = failed
+
+        for window, entity_ids in pending.items():
+            logging.error(f"Log volume of {window[0]} to {window[1]} failed for {len(entity_ids)} entities")
+        return results
+
+    async def fetch_log_volume_range(self, entity_ids, start, end, window=None, max_workers=None):
+        """Log volume of many entities from start to end as parallel day or week windows, merged per entity"""
+        entity_ids = list(entity_ids)
+        windows = APIHandler.plan_date_windows(start, end, window or self.LOG_VOLUME_WINDOW)
+        by_window = await self.fetch_log_volume_windows({window: entity_ids for window in windows}, max_workers)
+        return {entity_id: APIHandler.merge_log_volume_windows([by_window[window].get(entity_id) for window in windows]) for entity_id in entity_ids}
+
+    async def fetch_alarms(self, entity):
+        logging.info(f"Fetching Alarms")
+        response, error = await self.fetch_alarms_with_pagination('alarms/', APIHandler.alarm_params(entity), method='GET')
+        if error:
+            logging.error(f"Error fetching alarms: {error}")
+            return None
+        return response
+
+    async def fetch_alarm_detail(self, alarm_id):
+        """Fetch the events of a single alarm. Returns (response, None) or (None, error message)"""
+        response, error = await self.make_alarm_api_call(f"/alarms/{alarm_id}/events", method='GET')
+
+        if error:
+            return None, error
+        if not response:
+            return None, "No response received"
+        return response, None
+
+    async def fetch_alarm_details_with_errors(self, alarm_ids, max_workers=None):
+        """Fetch alarm details with at most max_workers lookups in flight. Returns (details in input order, {alarm_id: error})"""
+        alarm_ids = list(alarm_ids)
+        limit = asyncio.Semaphore(max_workers or self.ALARM_DETAIL_WORKERS)
+
+        async def fetch(alarm_id):
+            async with limit:
+                return await self.fetch_alarm_detail(alarm_id)
+
+        results = await asyncio.gather(*[fetch(alarm_id) for alarm_id in alarm_ids])
+
+        alarm_details = []
+        errors = {}
+        for alarm_id, (response, error) in zip(alarm_ids, results):
+            if error:
+                errors[alarm_id] = error
+                continue
+            alarm_details.append(response)
+
+        return alarm_details, errors
+
+    async def fetch_alarm_details(self, alarm_ids, max_workers=None):
+        logging.info("Fetching alarm details")
+        alarm_details, errors = await self.fetch_alarm_details_with_errors(alarm_ids, max_workers)
+
+        for alarm_id, error in errors.items():
+            logging.error(f"Error fetching alarm details for alarm ID {alarm_id}: {error}")
+
+        return alarm_details
+
+
+#######################################################################################################################################################################
+#######################################################################################################################################################################
+
+class SyncAPIHandler:
+    """Blocking wrapper around AsyncAPIHandler with the same fetch methods as APIHandler.
+    Every call runs on one private event loop, so the async connection pool is reused between calls."""
+
+    def __init__(self, api_handler=None, max_connections=100, max_connections_per_host=30):
+        self.loop = asyncio.new_event_loop()
+        self.async_handler = AsyncAPIHandler(api_handler, max_connections, max_connections_per_host)
+
+    def run(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def run_all(self, coroutines):
+        """Run several fetch coroutines concurrently and return their results in order"""
+        async def gather():
+            return await asyncio.gather(*coroutines)
+        return self.run(gather())
+
+    def close(self):
+        self.run(self.async_handler.close())
+        self.loop.close()
+
+    def fetch_entities(self):
+        return self.run(self.async_handler.fetch_entities())
+
+    def fetch_entity_log_source_overview(self, entityId):
+        return self.run(self.async_handler.fetch_entity_log_source_overview(entityId))
+
+    def fetch_entity_pending_log_sources(self):
+        return self.run(self.async_handler.fetch_entity_pending_log_sources())
+
+    def fetch_entity_log_volume(self, entityId, days=7):
+        return self.run(self.async_handler.fetch_entity_log_volume(entityId, days))
+
+    def fetch_log_volume_for_entities(self, entity_ids, batch_size=None, start=None, end=None):
+        return self.run(self.async_handler.fetch_log_volume_for_entities(entity_ids, batch_size, start, end))
+
+    def fetch_log_volume_windows(self, window_entity_ids, max_workers=None):
+        return self.run(self.async_handler.fetch_log_volume_windows(window_entity_ids, max_workers))
+
+    def fetch_log_volume_range(self, entity_ids, start, end, window=None, max_workers=None):
+        return self.run(self.async_handler.fetch_log_volume_range(entity_ids, start, end, window, max_workers))
+
+    def fetch_alarms(self, entity):
+        return self.run(self.async_handler.fetch_alarms(entity))
+
+    def fetch_alarm_details(self, alarm_ids, max_workers=None):
+        return self.run(self.async_handler.fetch_alarm_details(alarm_ids, max_workers))
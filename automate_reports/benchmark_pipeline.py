@@ -0,0 +1,181 @@
+import argparse
+import glob
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pptx import Presentation
+from pptx.util import Inches
+import main as pipeline
+from data_fetcher import APIHandler
+from mock_siem_server import MockSIEMServer, SyntheticDataset, add_scale_arguments, scale_from_args
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+RESULTS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_results")
+
+
+def make_template(path, slides=20, placeholders=("<Kunden>", "<Dato>"), shapes_per_slide=1):
+    """Write a synthetic deck template: slides numbered title slides, the placeholders on the first
+    slide, and shapes_per_slide extra text boxes per slide to emulate heavier templates"""
+    prs = Presentation()
+    layout = prs.slide_layouts[5]  # Title only
+    for number in range(1, slides + 1):
+        slide = prs.slides.add_slide(layout)
+        slide.shapes.title.text = f"Slide {number}"
+        for index in range(shapes_per_slide):
+            textbox = slide.shapes.add_textbox(Inches(0.5), Inches(1 + index * 0.3), Inches(8), Inches(0.3))
+            textbox.text_frame.text = f"Status for {' og '.join(placeholders)} - text box {index + 1}"
+    prs.save(path)
+    return path
+
+def environment_info():
+    """Interpreter, platform and git revision, so results from different machines and commits can be told apart"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'git_commit': commit
+    }
+
+def peak_rss_bytes():
+    """Peak resident memory of this process, None where the resource module is not available (Windows)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def summarize(values):
+    return {'min': min(values), 'median': statistics.median(values), 'max': max(values)}
+
+#######################################################################################################################################################################
+#######################################################################################################################################################################
+
+def run_pipeline(server, work_directory, workers=1, bulk_mode=True, rate_limit=None, replay_snapshot=None):
+    """Run main.main() once against the mock server (or a recorded snapshot) for all entities and return its timings"""
+    class BenchmarkAPIHandler(APIHandler):
+        def __init__(self):
+            super().__init__()
+            server.configure(self)
+            if rate_limit == 0:
+                self.rate_limiter = None
+            elif rate_limit is not None:
+                self.rate_limiter.rate = float(rate_limit)
+
+    telemetry_directory = os.path.join(work_directory, "telemetry")
+    config_path = os.path.join(work_directory, "report_config.ini")
+    with open(config_path, 'w', encoding='utf-8') as config_file:
+        config_file.write(f"[paths]\noutput_directory = {os.path.join(work_directory, 'reports')}\n"
+                          f"template_path = {make_template(os.path.join(work_directory, 'template.pptx'))}\n")
+
+    patched = {
+        'APIHandler': BenchmarkAPIHandler
+    }
+    original = {name: getattr(pipeline, name) for name in patched}
+    for name, value in patched.items():
+        setattr(pipeline, name, value)
+    pipeline.phase_timings.clear()
+    server.request_counts.clear()
+
+    try:
+        started = time.perf_counter()
+        argv = ["--entities", "all", "--config", config_path, "--no-cache", "--workers", str(workers), "--bulk", "on" if bulk_mode else "off",
+                "--entity-deadline", "0", "--telemetry-dir", telemetry_directory,
+                # Keep the synthetic entities out of the real log volume history next to main.py
+                "--history-path", os.path.join(work_directory, "log_volume_history.sqlite3")]
+        if replay_snapshot:
+            argv += ["--replay-snapshot", replay_snapshot]
+        results = pipeline.main(argv)
+        wall_seconds = time.perf_counter() - started
+    finally:
+        for name, value in original.items():
+            setattr(pipeline, name, value)
+
+    telemetry_files = sorted(glob.glob(os.path.join(telemetry_directory, "api_telemetry_*.json")))
+    api = {}
+    if telemetry_files:
+        with open(telemetry_files[-1], encoding='utf-8') as telemetry_file:
+            for endpoint, stats in json.load(telemetry_file)['endpoints'].items():
+                api[endpoint] = {key: stats[key] for key in ('requests', 'errors', 'retries', 'hedges', 'bytes', 'pages', 'latency_sum')}
+
+    return {
+        'wall_seconds': wall_seconds,
+        'phases': dict(pipeline.phase_timings),
+        'reports': {'succeeded': sum(1 for _, error in results if not error), 'failed': sum(1 for _, error in results if error)},
+        'api': api,
+        'server_requests': dict(server.request_counts),
+        'peak_rss_bytes': peak_rss_bytes()
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Time the report pipeline per phase against a local mock SIEM API")
+    add_scale_arguments(parser)
+    parser.add_argument("--workers", type=int, default=1, help="Report worker processes (passed to main --workers)")
+    parser.add_argument("--per-entity", action="store_true", help="Fetch per entity instead of in bulk (--bulk off)")
+    parser.add_argument("--rate-limit", type=float, help="Client requests/second (default: the APIHandler setting, 0 disables it)")
+    parser.add_argument("--replay-snapshot", metavar="DIR", help="Replay a recorded snapshot (main.py --record-snapshot) instead of the mock data")
+    parser.add_argument("--repeat", type=int, default=1, help="Number of timed runs")
+    parser.add_argument("--output", help="Results file (default: benchmark_results/pipeline_<scale>_<timestamp>.json)")
+    parser.add_argument("--verbose", action="store_true", help="Keep the pipeline's INFO logging")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    scale = scale_from_args(args)
+    dataset = SyntheticDataset(seed=args.seed, **scale)
+    server = MockSIEMServer(dataset, latency=args.latency).start()
+
+    runs = []
+    try:
+        for run in range(args.repeat):
+            with tempfile.TemporaryDirectory(prefix="automate_reports_bench_") as work_directory:
+                result = run_pipeline(server, work_directory, args.workers, not args.per_entity, args.rate_limit, args.replay_snapshot)
+            runs.append(result)
+            print(f"Run {run + 1}/{args.repeat}: {result['wall_seconds']:.2f}s "
+                  + ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in result['phases'].items()))
+    finally:
+        server.stop()
+
+    phases = sorted({phase for result in runs for phase in result['phases']})
+    results = {
+        'benchmark': 'pipeline',
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'environment': environment_info(),
+        'config': {**scale, 'seed': args.seed, 'latency': args.latency, 'workers': args.workers,
+                   'bulk_mode': not args.per_entity, 'rate_limit': args.rate_limit, 'replay_snapshot': args.replay_snapshot,
+                   'repeat': args.repeat},
+        'summary': {
+            'wall_seconds': summarize([result['wall_seconds'] for result in runs]),
+            'phases': {phase: summarize([result['phases'].get(phase, 0.0) for result in runs]) for phase in phases}
+        },
+        'runs': runs
+    }
+
+    output = args.output or os.path.join(RESULTS_DIRECTORY, f"pipeline_{args.scale}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as results_file:
+        json.dump(results, results_file, indent=2)
+    print(f"Results written to {output}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
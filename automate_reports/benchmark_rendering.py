@@ -0,0 +1,139 @@
+import argparse
+import csv
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from benchmark_pipeline import RESULTS_DIRECTORY, environment_info, make_template, summarize
+from excel_operations import ExcelOperations
+from powerpoint_operations import PowerPointProcess
+from table_data import format_thousands
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Template sizes: slides and extra text boxes per slide (the production template has 20+ slides)
+TEMPLATES = {
+    'small': {'slides': 20, 'shapes_per_slide': 1},
+    'medium': {'slides': 60, 'shapes_per_slide': 5},
+    'large': {'slides': 150, 'shapes_per_slide': 20}
+}
+
+ROW_COUNTS = (10, 100, 1000, 10000)
+
+TABLE_SLIDE = 18  # MPS/Log Volume slide in the production template
+
+REPLACEMENTS = {"<Kunden>": "Customer 0001", "<Dato>": "01/01/2024"}
+
+
+def write_csv(path, rows):
+    """Log volume shaped CSV export (as DataProcessor.write_to_csv writes it) with rows data rows plus the total row"""
+    with open(path, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(['Log Source Type', 'Logs Count', 'Logs/D', 'Logs/S'])
+        total = 0
+        for index in range(rows):
+            logs_count = (index + 1) * 123457
+            total += logs_count
+            writer.writerow([f'Log Source Type {index:05d}', format_thousands(logs_count),
+                             format_thousands(round(logs_count / 7)), format_thousands(round(logs_count / 604800))])
+        writer.writerow(['Total Logs', format_thousands(total), format_thousands(round(total / 7)), format_thousands(round(total / 604800))])
+    return path
+
+def measure(function, setup, repeat):
+    """Time function(*setup()) repeat times, then run it once more under tracemalloc for the peak memory.
+    setup runs outside the measurement (e.g. to copy a fresh deck that the function modifies in place).
+    tracemalloc only sees Python allocations, memory held inside lxml is not part of the peak."""
+    durations = []
+    for _ in range(repeat):
+        args = setup()
+        started = time.perf_counter()
+        function(*args)
+        durations.append(time.perf_counter() - started)
+
+    # Separate run, tracemalloc slows allocation-heavy code down too much to time it at the same time
+    args = setup()
+    tracemalloc.start()
+    try:
+        function(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {'wall_seconds': summarize(durations), 'peak_memory_bytes': peak}
+
+#######################################################################################################################################################################
+#######################################################################################################################################################################
+
+def benchmark_cases(work_directory, templates, row_counts):
+    """Yield (function name, template name, rows, function, setup) for every case"""
+    template_paths = {name: make_template(os.path.join(work_directory, f"template_{name}.pptx"), **TEMPLATES[name]) for name in templates}
+    csv_paths = {rows: write_csv(os.path.join(work_directory, f"table_{rows}.csv"), rows) for rows in row_counts}
+    deck_path = os.path.join(work_directory, "deck.pptx")
+    excel_path = os.path.join(work_directory, "table.xlsx")
+
+    def fresh_deck(template_path):
+        shutil.copyfile(template_path, deck_path)
+        return deck_path
+
+    for template, template_path in template_paths.items():
+        yield ('replace_text_in_ppt', template, None, PowerPointProcess.replace_text_in_ppt,
+               lambda template_path=template_path: (fresh_deck(template_path), REPLACEMENTS))
+
+        for rows, csv_path in csv_paths.items():
+            yield ('add_and_format_table_in_powerpoint', template, rows, PowerPointProcess.add_and_format_table_in_powerpoint,
+                   lambda template_path=template_path, csv_path=csv_path: (fresh_deck(template_path), TABLE_SLIDE, csv_path, 1.2, 1.2))
+
+    for rows, csv_path in csv_paths.items():
+        yield ('csv_to_excel', None, rows, ExcelOperations.csv_to_excel, lambda csv_path=csv_path: (csv_path, excel_path))
+
+        def unformatted_workbook(csv_path=csv_path):
+            ExcelOperations.csv_to_excel(csv_path, excel_path)
+            return (excel_path,)
+        yield ('format_mps_overview_excel', None, rows, ExcelOperations.format_mps_overview_excel, unformatted_workbook)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Time PowerPointProcess and ExcelOperations rendering and record peak memory")
+    parser.add_argument("--rows", type=int, nargs='+', default=list(ROW_COUNTS), help="Table sizes (data rows)")
+    parser.add_argument("--templates", nargs='+', choices=sorted(TEMPLATES), default=sorted(TEMPLATES), help="Template sizes")
+    parser.add_argument("--functions", nargs='+', help="Only run these functions (default: all)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case")
+    parser.add_argument("--output", help="Results file (default: benchmark_results/rendering_<timestamp>.json)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    # The functions log every save, which would dominate the small cases
+    logging.getLogger().setLevel(logging.WARNING)
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="automate_reports_bench_") as work_directory:
+        for function_name, template, rows, function, setup in benchmark_cases(work_directory, args.templates, args.rows):
+            if args.functions and function_name not in args.functions:
+                continue
+            result = {'function': function_name, 'template': template, 'rows': rows, **measure(function, setup, args.repeat)}
+            results.append(result)
+            print(f"{function_name:<36} template={template or '-':<7} rows={rows if rows is not None else '-':<6} "
+                  f"median {result['wall_seconds']['median'] * 1000:9.1f} ms  peak {result['peak_memory_bytes'] / 1024 / 1024:8.1f} MiB")
+
+    output = args.output or os.path.join(RESULTS_DIRECTORY, f"rendering_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as results_file:
+        json.dump({
+            'benchmark': 'rendering',
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'environment': environment_info(),
+            'config': {'rows': args.rows, 'templates': {name: TEMPLATES[name] for name in args.templates}, 'repeat': args.repeat},
+            'results': results
+        }, results_file, indent=2)
+    print(f"Results written to {output}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import logging
+from collections import defaultdict
+from data_processor import DataProcessor
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class EntityIndex:
+    """Records of one dataset grouped by entity ID and by entity name"""
+
+    def __init__(self, records=None):
+        # None means the fetch failed, so every lookup returns None like the per-entity fetch would
+        self.loaded = records is not None
+        self.by_id = defaultdict(list)
+        self.by_name = defaultdict(list)
+
+    def add(self, record, entity_id=None, entity_name=None):
+        if entity_id is not None:
+            self.by_id[entity_id].append(record)
+        if entity_name is not None:
+            self.by_name[entity_name].append(record)
+
+    def get(self, entity_id=None, entity_name=None):
+        if not self.loaded:
+            return None
+        if entity_id is not None and entity_id in self.by_id:
+            return self.by_id[entity_id]
+        return self.by_name.get(entity_name, [])
+
+    def __len__(self):
+        return max(len(self.by_id), len(self.by_name))
+
+
+class BulkDataset:
+    """Everything the reports need that is not entity-specific on the API side, fetched once per run:
+    the log-source inventory, today's silent log source alarms (with their details) and the
+    pending log-source queue. Each entity's slice is then handed to DataProcessor."""
+
+    def __init__(self):
+        self.log_sources = EntityIndex()
+        self.alarms = EntityIndex()
+        self.alarm_details = EntityIndex()
+        self.pending_log_sources = EntityIndex()
+
+    @staticmethod
+    def index_log_sources(log_sources):
+        index = EntityIndex(log_sources)
+        for item in log_sources or []:
+            entity = item.get('entity') or {}
+            index.add(item, entity.get('id'), entity.get('name'))
+        return index
+
+    @staticmethod
+    def index_alarms(alarms):
+        index = EntityIndex(alarms)
+        for alarm in alarms or []:
+            index.add(alarm, entity_name=alarm.get('entityName'))
+        return index
+
+    @staticmethod
+    def index_alarm_details(alarm_details):
+        index = EntityIndex(alarm_details)
+        for detail in alarm_details or []:
+            events = detail.get('alarmEventsDetails') or [{}]
+            index.add(detail, entity_name=events[0].get('entityName', 'N/A'))
+        return index
+
+    @staticmethod
+    def index_pending_log_sources(pending_log_sources):
+        index = EntityIndex(pending_log_sources)
+        for item in pending_log_sources or []:
+            index.add(item, entity_name=DataProcessor.pending_log_source_entity(item))
+        return index
+
+    @classmethod
+    def fetch(cls, api_handler, entity_names=None):
+        """Fetch all datasets once. Alarm details are only looked up for alarms of the given entities"""
+        dataset = cls()
+        logging.info("Fetching bulk data for all entities")
+
+        dataset.log_sources = cls.index_log_sources(api_handler.fetch_all_log_sources())
+        dataset.pending_log_sources = cls.index_pending_log_sources(api_handler.fetch_entity_pending_log_sources())
+
+        alarms = api_handler.fetch_all_alarms()
+        dataset.alarms = cls.index_alarms(alarms)
+        if alarms is not None:
+            wanted = set(entity_names) if entity_names is not None else None
+            selected_alarms = [alarm for alarm in alarms
+                               if wanted is None or alarm.get('entityName') is None or alarm.get('entityName') in wanted]
+            alarm_ids = DataProcessor.extract_alarm_ids(selected_alarms)
+            dataset.alarm_details = cls.index_alarm_details(api_handler.fetch_alarm_details(alarm_ids))
+
+        logging.info(f"Indexed log sources for {len(dataset.log_sources)} entities, "
+                     f"alarms for {len(dataset.alarms)} entities, pending log sources for {len(dataset.pending_log_sources)} entities")
+        return dataset
+
+    def for_entity(self, entity_id, entity_name):
+        """Return the raw records of one entity, in the shape the per-entity fetch_* methods return"""
+        return {
+            'log_source_overview': self.log_sources.get(entity_id, entity_name),
+            'alarms': self.alarms.get(entity_name=entity_name),
+            'alarm_details': self.alarm_details.get(entity_name=entity_name),
+            'pending_log_sources': self.pending_log_sources.get(entity_name=entity_name)
+        }
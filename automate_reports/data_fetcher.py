@@ -1,380 +1,870 @@
-# Fetch Data - Almost done
-
-# Generic API Call for main Endpoint - DONE
-
-# Replace Customer name in pptx - DONE
-
-# Get devices the customer currently has onboarded (LR) - DONE
-
-# Get MPS level from last week till now (LR) - DONE
-
-# Get missing log sources - DONE
-
-# CFCS Log Source Recommendations (CFCS)
-#https://www.cfcs.dk/da/forebyggelse/vejledninger/logning
-#https://www.cfcs.dk/globalassets/cfcs/dokumenter/vejledninger/vejledning-logning-2023.pdf
-
-# Customers Alarm Contacts (From OneNote) (Maybe DB)
-
-# Table with usecases and riskassesement from Ledelsesrapport
-import logging
-import requests
-from urllib.parse import urlencode
-import urllib3
-from urllib3.exceptions import InsecureRequestWarning
-from datetime import datetime, timedelta
-import json
-
-# Set up logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-
-
-# Disable insecure request warnings
-urllib3.disable_warnings(InsecureRequestWarning)
-
-class APIHandler:
-
-    #######################################################################################################################################################################
-    #######################################################################################################################################################################
-
-    def __init__(self):
-        #Harcoded values
-        self.BASE_ADMIN_URL = ""
-        self.BASE_METRICS_URL = ""
-        self.BASE_ALARM_URL = ""
-        self.API_KEY = ""
-        pass
-
-    def make_api_call(self, endpoint, method='GET', params=None):
-        url = f"{self.BASE_ADMIN_URL}/{endpoint}"
-        headers = {'Authorization': f'Bearer {self.API_KEY}'}
-        response = None
-
-        try:
-            logging.info(f"Making API call to {url}")
-            if method.upper() == 'GET':
-                response = requests.get(url, headers=headers, params=params, verify=False)
-            elif method.upper() == 'POST':
-                response = requests.post(url, headers=headers, json=params, verify=False)
-            else:
-                raise ValueError("Unsupported HTTP method")
-
-            response.raise_for_status()
-            return response.json(), None
-        except requests.exceptions.HTTPError as e:
-            error_msg = f"HTTP Error: {e}"
-        except requests.exceptions.ConnectionError as e:
-            error_msg = f"Connection Error: {e}"
-        except requests.exceptions.Timeout as e:
-            error_msg = f"Timeout Error: {e}"
-        except requests.exceptions.RequestException as e:
-            error_msg = f"Request Error: {e}"
-        except ValueError as e:
-            error_msg = str(e)
-        
-        logging.error(error_msg)
-        if response:
-            logging.error("Response content: %s", response.content)
-        
-        return None, error_msg
-
-    def make_metrics_api_call(self, endpoint, method='GET', params=None):
-        url = f"{self.BASE_METRICS_URL}/{endpoint}"
-        headers = {'Authorization': f'Bearer {self.API_KEY}'}
-        response = None
-
-        try:
-            logging.info(f"Making API call to {url}")
-            if method.upper() == 'GET':
-                response = requests.get(url, headers=headers, params=params, verify=False)
-            elif method.upper() == 'POST':
-                response = requests.post(url, headers=headers, json=params, verify=False)
-            else:
-                raise ValueError("Unsupported HTTP method")
-
-            response.raise_for_status()
-            return response.json(), None
-        except requests.exceptions.HTTPError as e:
-            error_msg = f"HTTP Error: {e}"
-        except requests.exceptions.ConnectionError as e:
-            error_msg = f"Connection Error: {e}"
-        except requests.exceptions.Timeout as e:
-            error_msg = f"Timeout Error: {e}"
-        except requests.exceptions.RequestException as e:
-            error_msg = f"Request Error: {e}"
-        except ValueError as e:
-            error_msg = str(e)
-        
-        logging.error(error_msg)
-        if response:
-            logging.error("Response content: %s", response.content)
-        
-        return None, error_msg
-
-
-    def make_alarm_api_call(self, endpoint, method='GET', params=None):
-        url = f"{self.BASE_ALARM_URL}/{endpoint}"
-        headers = {'Authorization': f'Bearer {self.API_KEY}'}
-        response = None
-
-        try:
-            logging.info(f"Making API call to {url}")
-            if method.upper() == 'GET':
-                response = requests.get(url, headers=headers, params=params, verify=False)
-            elif method.upper() == 'POST':
-                response = requests.post(url, headers=headers, json=params, verify=False)
-            else:
-                raise ValueError("Unsupported HTTP method")
-
-            response.raise_for_status()
-            return response.json(), None
-        except requests.exceptions.HTTPError as e:
-            error_msg = f"HTTP Error: {e}"
-        except requests.exceptions.ConnectionError as e:
-            error_msg = f"Connection Error: {e}"
-        except requests.exceptions.Timeout as e:
-            error_msg = f"Timeout Error: {e}"
-        except requests.exceptions.RequestException as e:
-            error_msg = f"Request Error: {e}"
-        except ValueError as e:
-            error_msg = str(e)
-        
-        logging.error(error_msg)
-        if response:
-            logging.error("Response content: %s", response.content)
-        
-        return None, error_msg
-
-
-    #######################################################################################################################################################################
-    #######################################################################################################################################################################
-
-    def fetch_with_pagination(self, base_endpoint, params, method='GET'):
-        all_data = []
-        count = 1000
-        offset = 0
-        error_message = None  # Initialize error message
-
-        logging.info(f"Fetching data with pagination from {base_endpoint}")
-        while True:
-            pagination_params = {'count': count, 'offset': offset, **params}
-            endpoint = f'{base_endpoint}?{urlencode(pagination_params)}' if method.upper() == 'GET' else base_endpoint
-            response, error = self.make_api_call(endpoint, method, pagination_params if method.upper() == 'POST' else None)
-
-            if error:
-                logging.error(f"Error fetching data: {error}")
-                error_message = error  # Store the error message
-                break
-
-            if not response:
-                logging.warning("No response received from API.")
-                break
-
-            data_batch = response
-            all_data.extend(data_batch)
-
-            if len(data_batch) < count:
-                break
-
-            offset += count
-
-        if error_message:
-            return None, error_message  # Return None for data and the error message
-        return all_data, None  # Return the data and None for the error message
-
-
-    def fetch_metrics_with_pagination(self, base_endpoint, params, method='GET'):
-        all_data = []
-        count = 1000
-        offset = 0
-        error_message = None  # Initialize error_message
-
-        logging.info(f"Fetching data with pagination from {base_endpoint}")
-        while True:
-            pagination_params = {'count': count, 'offset': offset, **params}
-            endpoint = f'{base_endpoint}?{urlencode(pagination_params)}' if method.upper() == 'GET' else base_endpoint
-            response, error = self.make_metrics_api_call(endpoint, method, pagination_params if method.upper() == 'POST' else None)
-
-            if error:
-                logging.error(f"Error fetching data: {error}")
-                error_message = error  # Assign the error message
-                break
-
-            if not response:
-                logging.warning("No response received from API.")
-                break
-
-            data_batch = response.get('data', [])
-            if not data_batch:
-                logging.warning("Data batch is empty or not present")
-                break
-
-            all_data.extend(data_batch)
-
-            if len(data_batch) < count:
-                break
-
-            offset += count
-
-        if error_message:
-            return None, error_message  # Return None for data and the error message
-        return all_data, None  # Return the data and None for the error message
-
-
-    def fetch_alarms_with_pagination(self, base_endpoint, params, method='GET'):
-        all_data = []
-        count = 1000
-        offset = 0
-        error_message = None  # Initialize error_message
-
-        logging.info(f"Fetching data with pagination from {base_endpoint}")
-        while True:
-            pagination_params = {'count': count, 'offset': offset, **params}
-            endpoint = f'{base_endpoint}?{urlencode(pagination_params)}' if method.upper() == 'GET' else base_endpoint
-            response, error = self.make_alarm_api_call(endpoint, method, pagination_params if method.upper() == 'POST' else None)
-
-            if error:
-                logging.error(f"Error fetching data: {error}")
-                error_message = error  # Store the error message
-                break
-
-            if not response:
-                logging.warning("No response received from API.")
-                break
-
-            # The data is under 'alarmsSearchDetails', not 'data'
-            data_batch = response.get('alarmsSearchDetails', [])
-            if not data_batch:
-                print("Data batch is empty or not present")
-                break
-
-            all_data.extend(data_batch)
-
-            # Pagination check
-            if len(data_batch) < count:
-                break
-
-            offset += count
-
-        if error_message:
-            return None, error_message  # Return None for data and the error message
-        return all_data, None  # Return the data and None for the error message
-
-
-    #######################################################################################################################################################################
-    #######################################################################################################################################################################
-
-
-    def fetch_entity_hosts(self, entity):
-        """Method to handle specific API call with customized parameters"""
-        count = 1000
-        status = "active"
-        endpoint = f'hosts/?count={count}&entity={entity}&recordStatus={status}'
-
-        logging.info(f"Fetching Entity Hosts for {entity}")
-        response, error = self.make_api_call(endpoint)
-        if error:
-            logging.error(f"Error fetching entity hosts: {error}")
-            return None
-        return response
-
-    def fetch_entities(self):
-        params = {        
-            
-        }
-        logging.info(f"Fetching entities")
-        response, error = self.fetch_with_pagination('entities/', params)
-        if error:
-            logging.error(f"Error fetching entities: {error}")
-            return None
-        return response
-
-    def fetch_entity_log_source_overview(self, entityId):
-        params = {        
-            'recordStatus': 'active',
-            'orderBy': 'logSourceType',
-            'entityId': entityId
-        }
-        logging.info(f"Fetching Log Sources")
-        response, error = self.fetch_with_pagination('logsources/', params)
-        if error:
-            logging.error(f"Error fetching log sources: {error}")
-            return None
-        return response
-
-    def fetch_entity_pending_log_sources(self):
-        params = {
-            'logSourceAcceptanceStatus': 'Pending',
-            'orderBy': 'name'
-        }
-        logging.info(f"Fetching Pending Log Sources")
-        response, error = self.fetch_with_pagination('logsources-request/', params)
-        if error:
-            logging.error(f"Error fetching pending log sources: {error}")
-            return None
-        return response
-    
-    def fetch_entity_log_volume(self, entityId):
-        # Calculate dates
-        today = datetime.now()
-        week_ago = today - timedelta(days=7)
-
-        # Format dates to 'YYYY-MM-DD'
-        max_date = today.strftime('%Y-%m-%d')
-        min_date = week_ago.strftime('%Y-%m-%d')
-
-        # Prepare parameters
-        params = {
-            'minDate': min_date,
-            'maxDate': max_date,
-            'groupBy': {
-                'fieldName': 'Entity',
-                'Ids': [entityId]
-            }
-        }
-        logging.info(f"Fetching Log Volume for Entity ID: {entityId}")
-        response, error = self.fetch_metrics_with_pagination('logvolume/', params, method='POST')
-        if error:
-            logging.error(f"Error fetching log volume: {error}")
-            return None
-        return response
-    
-    def fetch_alarms(self, entity):
-        today = datetime.now().strftime('%Y-%m-%d')  # Full timestamp format
-
-        params = {
-            'alarmRuleName': 'DBX: LogRhythm Silent Log Source Error',
-            'dateInserted': today,
-            'entityName': entity,
-            'count': 1000  # Adjust based on how many results you want per page
-        }
-        logging.info(f"Fetching Alarms")
-        response, error = self.fetch_alarms_with_pagination('alarms/', params, method='GET')
-        if error:
-            logging.error(f"Error fetching alarms: {error}")
-            return None
-        return response
-
-    def fetch_alarm_details(self, alarm_ids):
-        alarm_details = []
-
-        logging.info("Fetching alarm details")
-        for alarm_id in alarm_ids:
-            resource = f"/alarms/{alarm_id}/events"
-            response, error = self.make_alarm_api_call(resource, method='GET')
-
-            if error:
-                logging.error(f"Error fetching alarm details for alarm ID {alarm_id}: {error}")
-                continue
-
-            if not response:
-                logging.warning(f"No response received for alarm ID {alarm_id}.")
-                continue
-
-            alarm_details.append(response)
-
-        return alarm_details
-
-
-    #######################################################################################################################################################################
-    #######################################################################################################################################################################
+# Fetch Data - Almost done
+
+# Generic API Call for main Endpoint - DONE
+
+# Replace Customer name in pptx - DONE
+
+# Get devices the customer currently has onboarded (LR) - DONE
+
+# Get MPS level from last week till now (LR) - DONE
+
+# Get missing log sources - DONE
+
+# CFCS Log Source Recommendations (CFCS)
+#https://www.cfcs.dk/da/forebyggelse/vejledninger/logning
+#https://www.cfcs.dk/globalassets/cfcs/dokumenter/vejledninger/vejledning-logning-2023.pdf
+
+# Customers Alarm Contacts (From OneNote) (Maybe DB)
+
+# Table with usecases and riskassesement from Ledelsesrapport
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+import requests
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlencode, urlsplit
+import urllib3
+from urllib3.exceptions import InsecureRequestWarning
+from datetime import datetime, timedelta
+import json
+from response_cache import ResponseCache
+from snapshot_store import SnapshotStore
+from retry_policy import RetryPolicy, TokenBucket
+from telemetry import APITelemetry, endpoint_name
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+# Disable insecure request warnings
+urllib3.disable_warnings(InsecureRequestWarning)
+
+class APIError(Exception):
+    """Raised by the streaming iter_* methods when a page cannot be fetched"""
+    pass
+
+
+class DeadlineExceeded(APIError):
+    """Raised by APIHandler.check_deadline when the current report ran past its deadline"""
+    pass
+
+
+class APIHandler:
+
+    # Endpoint family of each make_*_call method, used to label pages in the telemetry
+    API_CALL_FAMILIES = {
+        'make_api_call': 'admin',
+        'make_metrics_api_call': 'metrics',
+        'make_alarm_api_call': 'alarm'
+    }
+
+    #######################################################################################################################################################################
+    #######################################################################################################################################################################
+
+    def __init__(self):
+        #Harcoded values
+        self.BASE_ADMIN_URL = ""
+        self.BASE_METRICS_URL = ""
+        self.BASE_ALARM_URL = ""
+        self.API_KEY = ""
+
+        # Connection pooling - one keep-alive pool per base URL, shared by every call
+        self.POOL_SIZE = 10
+
+        # Concurrency - number of parallel /alarms/{id}/events lookups (keep <= POOL_SIZE)
+        self.ALARM_DETAIL_WORKERS = 8
+
+        # Timeouts - connect and read timeout (seconds) for every call, and an optional deadline set per report
+        self.CONNECT_TIMEOUT = 10
+        self.READ_TIMEOUT = 120
+        self.deadline_at = None
+
+        # Hedged requests - duplicate an idempotent GET that is slower than the p95 observed so far
+        self.HEDGE_REQUESTS = True
+        self.HEDGE_MIN_SAMPLES = 20
+        self.HEDGE_SAMPLE_SIZE = 500
+        self.latency_samples = {}
+        self._latency_lock = threading.Lock()
+        self._hedge_executor = None
+        self._hedge_lock = threading.Lock()
+
+        # Retries - backoff policy per endpoint family, and a client-side rate limit (requests/second) shared by all calls
+        self.retry_policies = {
+            'admin': RetryPolicy(max_retries=4, base_delay=0.5, max_total_time=60),
+            'metrics': RetryPolicy(max_retries=5, base_delay=1.0, max_total_time=180),
+            'alarm': RetryPolicy(max_retries=4, base_delay=0.5, max_total_time=60)
+        }
+        self.rate_limiter = TokenBucket(rate=20, capacity=40)
+
+        # Telemetry - requests, latency, bytes, pages, retries and errors per entity and endpoint (see telemetry.py)
+        self.telemetry = APITelemetry()
+
+        # Response cache - optional persistent cache for slow-changing endpoints (see enable_response_cache)
+        self.response_cache = None
+        self.REFRESH_CACHE = False
+
+        # Snapshots - optionally record every raw response of the run, or replay a recorded run without network
+        self.snapshot_store = None
+
+        # Run cache - identical requests (same URL, method and params) are served from memory after the first call.
+        # Only entity-independent endpoints that a run asks for repeatedly are kept; per-entity pages, alarm events
+        # and log volume never repeat and would only pin every record of the run in memory
+        self.USE_RUN_CACHE = True
+        self.RUN_CACHE_ENDPOINTS = ('entities/', 'logsources-request/')
+        self.run_cache = {}
+        self._run_cache_lock = threading.Lock()
+
+        # Log volume - entity IDs per batched logvolume/ request
+        self.LOG_VOLUME_BATCH_SIZE = 50
+
+        # Log volume ranges - ranges longer than LOG_VOLUME_SINGLE_REQUEST_DAYS are split into day or week windows,
+        # fetched LOG_VOLUME_WORKERS at a time; windows that fail are refetched on their own up to LOG_VOLUME_WINDOW_RETRIES times
+        self.LOG_VOLUME_SINGLE_REQUEST_DAYS = 7
+        self.LOG_VOLUME_WINDOW = 'week'
+        self.LOG_VOLUME_WORKERS = 4
+        self.LOG_VOLUME_WINDOW_RETRIES = 2
+
+        # Pagination - rows per page and how many offset windows to request in parallel after a full page
+        self.PAGE_SIZE = 1000
+        self.PAGE_FANOUT = 4
+        # Common headers of every pooled session; the Authorization header is added per call (see auth_headers)
+        self.headers = {
+            'Accept': 'application/json',
+            'Accept-Encoding': 'gzip, deflate',
+            'Connection': 'keep-alive'
+        }
+        self.sessions = {}
+        self._sessions_lock = threading.Lock()
+
+    def auth_headers(self):
+        """Authorization header built from API_KEY on every call, so the key can be set after construction
+        like the base URLs"""
+        return {'Authorization': f'Bearer {self.API_KEY}'}
+
+    def get_session(self, base_url):
+        """Return the pooled session for a base URL, creating it on first use"""
+        session = self.sessions.get(base_url)
+        if session is not None:
+            return session
+
+        with self._sessions_lock:
+            session = self.sessions.get(base_url)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.POOL_SIZE, pool_block=True)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                session.headers.update(self.headers)
+                session.verify = False
+                self.sessions[base_url] = session
+                logging.info(f"Opened connection pool for {base_url} (size {self.POOL_SIZE})")
+        return session
+
+    def close(self):
+        """Close all pooled connections"""
+        with self._sessions_lock:
+            for session in self.sessions.values():
+                session.close()
+            self.sessions.clear()
+        if self.response_cache is not None:
+            self.response_cache.close()
+            self.response_cache = None
+        with self._hedge_lock:
+            if self._hedge_executor is not None:
+                self._hedge_executor.shutdown(wait=False)
+                self._hedge_executor = None
+
+    def enable_response_cache(self, path, refresh=False, ttls=None, max_bytes=200 * 1024 * 1024):
+        """Cache slow-changing GET responses on disk. With refresh the cache is rewritten but never read"""
+        self.response_cache = ResponseCache(path, ttls, max_bytes)
+        self.REFRESH_CACHE = refresh
+
+    def enable_snapshots(self, directory, mode='record', compression='gzip'):
+        """Record every successful response to a snapshot directory, or (mode='replay') serve all calls from one"""
+        self.snapshot_store = SnapshotStore(directory, mode, compression)
+        return self.snapshot_store
+
+    def clear_run_cache(self):
+        with self._run_cache_lock:
+            self.run_cache.clear()
+
+    def run_cache_enabled(self, endpoint):
+        """Whether responses of an endpoint are memoized for the run (see RUN_CACHE_ENDPOINTS)"""
+        path = urlsplit(endpoint).path.lstrip('/')
+        return self.USE_RUN_CACHE and path.startswith(self.RUN_CACHE_ENDPOINTS)
+
+    def request(self, base_url, endpoint, method='GET', params=None, use_run_cache=True, family='admin'):
+        """Single code path for all API calls. Returns (json, None) or (None, error message).
+        Successful responses of RUN_CACHE_ENDPOINTS are memoized for the rest of the run; callers must not modify them."""
+        if self.snapshot_store is not None and self.snapshot_store.replay:
+            return self.snapshot_store.get(family, method, endpoint, params)
+
+        cache_key = None
+        if use_run_cache and self.run_cache_enabled(endpoint):
+            cache_key = (base_url, endpoint, method.upper(), json.dumps(params, sort_keys=True, default=str))
+            with self._run_cache_lock:
+                if cache_key in self.run_cache:
+                    logging.info(f"Serving {base_url}/{endpoint} from run cache")
+                    return self.run_cache[cache_key], None
+
+        data, error = self.send(base_url, endpoint, method, params, family)
+        if self.snapshot_store is not None and error is None:
+            self.snapshot_store.record(family, method, endpoint, params, data)
+        if cache_key is not None and error is None:
+            with self._run_cache_lock:
+                self.run_cache[cache_key] = data
+        return data, error
+
+    def send(self, base_url, endpoint, method='GET', params=None, family='admin'):
+        """Perform the HTTP call on the pooled session, retrying transient failures (connection errors,
+        timeouts, 429 and 5xx) with the endpoint family's RetryPolicy. Returns (json, None) or (None, error message)"""
+        url = f"{base_url}/{endpoint}"
+
+        # Persistent cache for slow-changing GET endpoints
+        cache_key = None
+        cached = None
+        headers = {}
+        ttl = self.response_cache.ttl_for(endpoint) if self.response_cache is not None and method.upper() == 'GET' else None
+        if ttl is not None:
+            cache_key = self.response_cache.make_key(url, params)
+            cached = None if self.REFRESH_CACHE else self.response_cache.get(cache_key)
+            if cached is not None:
+                if self.response_cache.is_fresh(cached, ttl):
+                    logging.info(f"Serving {url} from response cache")
+                    return cached['data'], None
+                headers = self.response_cache.conditional_headers(cached)
+
+        policy = self.retry_policies.get(family) or self.retry_policies['admin']
+        label = endpoint_name(family, endpoint)
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            # Never wait on the network past the current entity's deadline
+            remaining = self.deadline_remaining()
+            if remaining is not None and remaining <= 0:
+                error_msg = f"Deadline Error: report deadline exceeded before calling {url}"
+                response = None
+                break
+            read_timeout = self.READ_TIMEOUT if remaining is None else min(self.READ_TIMEOUT, remaining)
+
+            data, error_msg, response, retryable = self.send_once(base_url, url, method, params, headers, cached, cache_key,
+                                                                  timeout=(self.CONNECT_TIMEOUT, read_timeout), family=family, label=label)
+            if error_msg is None:
+                return data, None
+
+            retry_after = RetryPolicy.parse_retry_after(response.headers.get('Retry-After')) if response is not None else None
+            delay = policy.delay_for(attempt, retry_after, time.monotonic() - started) if retryable else None
+            remaining = self.deadline_remaining()
+            if delay is None or (remaining is not None and delay >= remaining):
+                break
+
+            attempt += 1
+            self.telemetry.record_retry(label)
+            logging.warning(f"{error_msg} - retrying {url} in {delay:.1f}s (retry {attempt} of {policy.max_retries})")
+            time.sleep(delay)
+
+        self.telemetry.record_error(label)
+        logging.error(error_msg)
+        if response is not None:
+            logging.error("Response content: %s", response.content)
+
+        return None, error_msg
+
+    def send_once(self, base_url, url, method, params, headers, cached=None, cache_key=None, timeout=None, family='admin', label=None):
+        """One HTTP attempt. Returns (json, error message, response, retryable)"""
+        response = None
+
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+
+        started = time.monotonic()
+        try:
+            logging.info(f"Making API call to {url}")
+            session = self.get_session(base_url)
+            if method.upper() == 'GET' and self.HEDGE_REQUESTS:
+                response = self.perform_hedged(session, url, method, params, headers, timeout, family, label)
+            else:
+                response = self.perform(session, url, method, params, headers, timeout)
+            if response.status_code < 400:
+                self.record_latency(family, time.monotonic() - started)
+
+            if response.status_code == 304 and cached is not None:
+                logging.info(f"{url} not modified, revalidated response cache entry")
+                self.response_cache.touch(cache_key)
+                return cached['data'], None, response, False
+
+            response.raise_for_status()
+            data = response.json()
+            if cache_key is not None:
+                self.response_cache.put(cache_key, url, response.content,
+                                        response.headers.get('ETag'), response.headers.get('Last-Modified'))
+            return data, None, response, False
+        except requests.exceptions.HTTPError as e:
+            return None, f"HTTP Error: {e}", response, response.status_code in RetryPolicy.RETRY_STATUS_CODES
+        except requests.exceptions.ConnectionError as e:
+            return None, f"Connection Error: {e}", response, True
+        except requests.exceptions.Timeout as e:
+            return None, f"Timeout Error: {e}", response, True
+        except requests.exceptions.RequestException as e:
+            return None, f"Request Error: {e}", response, False
+        except ValueError as e:
+            return None, str(e), response, False
+        finally:
+            if label is not None:
+                self.telemetry.record_request(label, time.monotonic() - started, len(response.content) if response is not None else 0)
+
+    def perform(self, session, url, method, params, headers, timeout):
+        headers = {**self.auth_headers(), **(headers or {})}
+        if method.upper() == 'GET':
+            return session.get(url, params=params, headers=headers, timeout=timeout)
+        elif method.upper() == 'POST':
+            return session.post(url, json=params, headers=headers, timeout=timeout)
+        raise ValueError("Unsupported HTTP method")
+
+    def record_latency(self, family, seconds):
+        with self._latency_lock:
+            self.latency_samples.setdefault(family, deque(maxlen=self.HEDGE_SAMPLE_SIZE)).append(seconds)
+
+    def hedge_threshold(self, family):
+        """p95 of the latencies observed so far for the family, or None until enough samples exist"""
+        with self._latency_lock:
+            samples = sorted(self.latency_samples.get(family, ()))
+        if len(samples) < self.HEDGE_MIN_SAMPLES:
+            return None
+        return samples[int(0.95 * (len(samples) - 1))]
+
+    def perform_hedged(self, session, url, method, params, headers, timeout, family, label=None):
+        """Send an idempotent GET and, if it is slower than the p95 seen so far, a duplicate.
+        The first successful answer wins; the slower request is left to finish in the background.
+        The caller records the winning request, the other one is recorded here when it finishes."""
+        threshold = self.hedge_threshold(family)
+        if threshold is None:
+            return self.perform(session, url, method, params, headers, timeout)
+
+        with self._hedge_lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = ThreadPoolExecutor(max_workers=self.POOL_SIZE, thread_name_prefix='hedge')
+            executor = self._hedge_executor
+
+        started = time.monotonic()
+        first = executor.submit(self.perform, session, url, method, params, headers, timeout)
+        done, _ = wait([first], timeout=threshold)
+        if done:
+            return first.result()
+
+        logging.info(f"Hedging slow request to {url} after {threshold:.2f}s")
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        hedge_started = time.monotonic()
+        second = executor.submit(self.perform, session, url, method, params, headers, timeout)
+        if label is not None:
+            self.telemetry.record_hedge(label)
+
+        last_error = None
+        for future in as_completed([first, second]):
+            try:
+                response = future.result()
+            except requests.exceptions.RequestException as e:
+                last_error = e
+                continue
+            if label is not None:
+                if future is first:
+                    self.record_hedged_request(second, label, hedge_started)
+                else:
+                    self.record_hedged_request(first, label, started)
+            return response
+        if label is not None:
+            self.record_hedged_request(second, label, hedge_started)
+        raise last_error
+
+    def record_hedged_request(self, future, label, started):
+        """Count the request of a hedge that did not answer the call, with its latency and bytes once it finishes"""
+        entity = self.telemetry.current_entity
+
+        def record(done):
+            response = None if done.exception() is not None else done.result()
+            self.telemetry.record_request(label, time.monotonic() - started, len(response.content) if response is not None else 0, entity)
+
+        future.add_done_callback(record)
+
+    @contextmanager
+    def deadline(self, seconds):
+        """Bound the total time API calls may take inside the block (one report at a time per handler).
+        Once it has passed, calls fail fast with a Deadline Error instead of hitting the network."""
+        previous = self.deadline_at
+        self.deadline_at = None if seconds is None else time.monotonic() + seconds
+        try:
+            yield
+        finally:
+            self.deadline_at = previous
+
+    def deadline_remaining(self):
+        if self.deadline_at is None:
+            return None
+        return self.deadline_at - time.monotonic()
+
+    def check_deadline(self):
+        remaining = self.deadline_remaining()
+        if remaining is not None and remaining <= 0:
+            raise DeadlineExceeded("Report deadline exceeded")
+
+    def make_api_call(self, endpoint, method='GET', params=None, use_run_cache=True):
+        return self.request(self.BASE_ADMIN_URL, endpoint, method, params, use_run_cache, family='admin')
+
+    def make_metrics_api_call(self, endpoint, method='GET', params=None, use_run_cache=True):
+        return self.request(self.BASE_METRICS_URL, endpoint, method, params, use_run_cache, family='metrics')
+
+    def make_alarm_api_call(self, endpoint, method='GET', params=None, use_run_cache=True):
+        return self.request(self.BASE_ALARM_URL, endpoint, method, params, use_run_cache, family='alarm')
+
+
+    #######################################################################################################################################################################
+    #######################################################################################################################################################################
+
+    def fetch_page(self, api_call, base_endpoint, params, method, offset, data_key=None, use_run_cache=True):
+        """Fetch one page at the given offset. Returns (batch, None), (None, None) for no response, or (None, error)"""
+        pagination_params = {'count': self.PAGE_SIZE, 'offset': offset, **params}
+        endpoint = f'{base_endpoint}?{urlencode(pagination_params)}' if method.upper() == 'GET' else base_endpoint
+        response, error = api_call(endpoint, method, pagination_params if method.upper() == 'POST' else None, use_run_cache)
+
+        if error:
+            return None, error
+        if not response:
+            return None, None
+        self.telemetry.record_page(endpoint_name(self.API_CALL_FAMILIES.get(api_call.__name__, 'admin'), base_endpoint))
+        if data_key:
+            return response.get(data_key, []), None
+        return response, None
+
+    def iter_pages(self, api_call, base_endpoint, params, method='GET', data_key=None, use_run_cache=True):
+        """Yield the pages of an endpoint in offset order. After a full first page the next
+        PAGE_FANOUT offsets are requested in parallel waves until a short or empty page shows up.
+        Raises APIError if a page fails."""
+        count = params.get('count', self.PAGE_SIZE)
+        fanout = max(1, self.PAGE_FANOUT)
+
+        def fetch(offset):
+            return self.fetch_page(api_call, base_endpoint, params, method, offset, data_key, use_run_cache)
+
+        logging.info(f"Fetching data with pagination from {base_endpoint}")
+        executor = None
+        try:
+            offset = 0
+            wave = [fetch(offset)]
+            while True:
+                for data_batch, error in wave:
+                    if error:
+                        logging.error(f"Error fetching data: {error}")
+                        raise APIError(error)
+
+                    if not data_batch:
+                        if data_batch is None:
+                            logging.warning("No response received from API.")
+                        else:
+                            logging.warning("Data batch is empty or not present")
+                        return
+
+                    yield data_batch
+                    offset += count
+
+                    # Pagination check
+                    if len(data_batch) < count:
+                        return
+
+                if fanout == 1:
+                    wave = [fetch(offset)]
+                    continue
+
+                if executor is None:
+                    executor = ThreadPoolExecutor(max_workers=fanout)
+                wave = list(executor.map(fetch, [offset + i * count for i in range(fanout)]))
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    def iter_records(self, api_call, base_endpoint, params, method='GET', data_key=None):
+        """Yield the records of an endpoint one by one, holding only the current page in memory"""
+        for data_batch in self.iter_pages(api_call, base_endpoint, params, method, data_key, use_run_cache=False):
+            yield from data_batch
+
+    def paginate(self, api_call, base_endpoint, params, method='GET', data_key=None):
+        """Collect all pages of an endpoint into one list. Returns (data, None) or (None, error message)"""
+        all_data = []
+        try:
+            for data_batch in self.iter_pages(api_call, base_endpoint, params, method, data_key):
+                all_data.extend(data_batch)
+        except APIError as e:
+            return None, str(e)  # Return None for data and the error message
+
+        return all_data, None  # Return the data and None for the error message
+
+    def fetch_with_pagination(self, base_endpoint, params, method='GET'):
+        return self.paginate(self.make_api_call, base_endpoint, params, method)
+
+    def fetch_metrics_with_pagination(self, base_endpoint, params, method='GET'):
+        return self.paginate(self.make_metrics_api_call, base_endpoint, params, method, data_key='data')
+
+    def fetch_alarms_with_pagination(self, base_endpoint, params, method='GET'):
+        # The data is under 'alarmsSearchDetails', not 'data'
+        return self.paginate(self.make_alarm_api_call, base_endpoint, params, method, data_key='alarmsSearchDetails')
+
+
+    #######################################################################################################################################################################
+    #######################################################################################################################################################################
+
+    # Request parameters - shared by APIHandler and AsyncAPIHandler
+
+    @staticmethod
+    def log_source_params(entityId=None):
+        params = {
+            'recordStatus': 'active',
+            'orderBy': 'logSourceType'
+        }
+        if entityId is not None:
+            params['entityId'] = entityId
+        return params
+
+    @staticmethod
+    def pending_log_source_params():
+        return {
+            'logSourceAcceptanceStatus': 'Pending',
+            'orderBy': 'name'
+        }
+
+    @staticmethod
+    def log_volume_params(entity_ids, days=7, start=None, end=None):
+        """Log volume of the last days up to today, or of the dates start (minDate) to end (maxDate)"""
+        # Calculate dates
+        today = end or datetime.now()
+        week_ago = start or today - timedelta(days=days)
+
+        # Format dates to 'YYYY-MM-DD'
+        max_date = today.strftime('%Y-%m-%d')
+        min_date = week_ago.strftime('%Y-%m-%d')
+
+        return {
+            'minDate': min_date,
+            'maxDate': max_date,
+            'groupBy': {
+                'fieldName': 'Entity',
+                'Ids': list(entity_ids)
+            }
+        }
+
+    @staticmethod
+    def plan_date_windows(start, end, window='day'):
+        """Split the dates from start up to end into consecutive (start, end) windows of one day, or of one
+        week ending on Sundays (the first and last week are cut off at start and end)"""
+        if window not in ('day', 'week'):
+            raise ValueError(f"Unknown log volume window: {window}")
+        start = start.date() if isinstance(start, datetime) else start
+        end = end.date() if isinstance(end, datetime) else end
+
+        windows = []
+        while start < end:
+            if window == 'day':
+                window_end = start + timedelta(days=1)
+            else:
+                window_end = min(start + timedelta(days=7 - start.weekday()), end)
+            windows.append((start, window_end))
+            start = window_end
+        return windows
+
+    @staticmethod
+    def merge_log_volume_windows(responses):
+        """Combine the logvolume/ responses of consecutive windows into one response for the whole range, in
+        the shape DataProcessor.process_log_volume consumes: logsCount summed per log source type and the
+        totalLogs of every window summed. None if any window is missing"""
+        if any(response is None for response in responses):
+            return None
+
+        counts = {}
+        total_logs = 0
+        for response in responses:
+            for item in response:
+                for log_info in item.get('logSourceTypeInfo', []):
+                    log_source_type = log_info.get('logSourceType')
+                    if log_source_type:
+                        counts[log_source_type] = counts.get(log_source_type, 0) + int(log_info.get('logsCount', 0))
+            if response:
+                total_logs += int(response[-1].get('totalLogs', 0))
+
+        return [{
+            'logSourceTypeInfo': [{'logSourceType': log_source_type, 'logsCount': count} for log_source_type, count in sorted(counts.items())],
+            'totalLogs': total_logs
+        }]
+
+    @staticmethod
+    def alarm_params(entity=None):
+        today = datetime.now().strftime('%Y-%m-%d')  # Full timestamp format
+
+        params = {
+            'alarmRuleName': 'DBX: LogRhythm Silent Log Source Error',
+            'dateInserted': today,
+            'count': 1000  # Adjust based on how many results you want per page
+        }
+        if entity is not None:
+            params['entityName'] = entity
+        return params
+
+
+    #######################################################################################################################################################################
+    #######################################################################################################################################################################
+
+
+    def fetch_entity_hosts(self, entity):
+        """Method to handle specific API call with customized parameters"""
+        count = 1000
+        status = "active"
+        endpoint = f'hosts/?count={count}&entity={entity}&recordStatus={status}'
+
+        logging.info(f"Fetching Entity Hosts for {entity}")
+        response, error = self.make_api_call(endpoint)
+        if error:
+            logging.error(f"Error fetching entity hosts: {error}")
+            return None
+        return response
+
+    def fetch_entities(self):
+        params = {}
+        logging.info(f"Fetching entities")
+        response, error = self.fetch_with_pagination('entities/', params)
+        if error:
+            logging.error(f"Error fetching entities: {error}")
+            return None
+        return response
+
+    def fetch_entity_log_source_overview(self, entityId):
+        params = self.log_source_params(entityId)
+        logging.info(f"Fetching Log Sources")
+        response, error = self.fetch_with_pagination('logsources/', params)
+        if error:
+            logging.error(f"Error fetching log sources: {error}")
+            return None
+        return response
+
+    def fetch_all_log_sources(self):
+        """Fetch the active log-source inventory of every entity in one pass"""
+        logging.info(f"Fetching Log Sources for all entities")
+        response, error = self.fetch_with_pagination('logsources/', self.log_source_params())
+        if error:
+            logging.error(f"Error fetching log sources: {error}")
+            return None
+        return response
+
+    def iter_entity_log_source_overview(self, entityId):
+        """Stream an entity's log sources record by record"""
+        logging.info(f"Streaming Log Sources")
+        return self.iter_records(self.make_api_call, 'logsources/', self.log_source_params(entityId))
+
+    def iter_all_log_sources(self):
+        """Stream the log-source inventory of every entity record by record"""
+        logging.info(f"Streaming Log Sources for all entities")
+        return self.iter_records(self.make_api_call, 'logsources/', self.log_source_params())
+
+    def iter_entity_pending_log_sources(self):
+        """Stream the pending log-source queue record by record"""
+        logging.info(f"Streaming Pending Log Sources")
+        return self.iter_records(self.make_api_call, 'logsources-request/', self.pending_log_source_params())
+
+    def fetch_entity_pending_log_sources(self):
+        params = self.pending_log_source_params()
+        logging.info(f"Fetching Pending Log Sources")
+        response, error = self.fetch_with_pagination('logsources-request/', params)
+        if error:
+            logging.error(f"Error fetching pending log sources: {error}")
+            return None
+        return response
+    
+    def fetch_entity_log_volume(self, entityId, days=7):
+        if days > self.LOG_VOLUME_SINGLE_REQUEST_DAYS:
+            # Long ranges are fetched as parallel windows, so one slow window does not time out the whole range
+            today = datetime.now()
+            return self.fetch_log_volume_range([entityId], today - timedelta(days=days), today).get(entityId)
+
+        params = self.log_volume_params([entityId], days=days)
+        logging.info(f"Fetching Log Volume for Entity ID: {entityId}")
+        response, error = self.fetch_metrics_with_pagination('logvolume/', params, method='POST')
+        if error:
+            logging.error(f"Error fetching log volume: {error}")
+            return None
+        return response
+    
+    @staticmethod
+    def log_volume_entity_id(item):
+        """Return the entity ID a grouped log volume item belongs to, or None if it does not say"""
+        for key in ('groupById', 'entityId', 'id'):
+            if item.get(key) is not None:
+                return item[key]
+        return (item.get('entity') or {}).get('id')
+
+    def fetch_log_volume_for_entities_with_errors(self, entity_ids, batch_size=None, start=None, end=None):
+        """Fetch the log volume of many entities with one logvolume/ request per batch of IDs, for the last
+        week or for the dates start to end. Returns ({entity ID: response in the shape fetch_entity_log_volume
+        returns, or None}, {entity ID: error} for the entities whose request failed)"""
+        entity_ids = list(entity_ids)
+        batch_size = batch_size or self.LOG_VOLUME_BATCH_SIZE
+        log_volumes = {}
+        errors = {}
+
+        for offset in range(0, len(entity_ids), batch_size):
+            batch = entity_ids[offset:offset + batch_size]
+            logging.info(f"Fetching Log Volume for {len(batch)} entities")
+            response, error = self.fetch_metrics_with_pagination('logvolume/', self.log_volume_params(batch, start=start, end=end), method='POST')
+            if error:
+                logging.error(f"Error fetching log volume: {error}")
+                log_volumes.update({entity_id: None for entity_id in batch})
+                errors.update({entity_id: error for entity_id in batch})
+                continue
+
+            log_volumes.update(self.split_log_volume_by_entity(response, batch))
+
+        return log_volumes, errors
+
+    def fetch_log_volume_for_entities(self, entity_ids, batch_size=None, start=None, end=None):
+        """{entity ID: response} of fetch_log_volume_for_entities_with_errors. Entities of a batch that failed,
+        or whose items could not be attributed, map to None so callers can fall back."""
+        log_volumes, _ = self.fetch_log_volume_for_entities_with_errors(entity_ids, batch_size, start, end)
+        return log_volumes
+
+    @classmethod
+    def split_log_volume_by_entity(cls, response, batch):
+        """{entity ID: its items} of a grouped logvolume/ response for a batch of entity IDs. If any item
+        cannot be attributed, the whole batch maps to None so it is refetched per entity"""
+        by_entity = {entity_id: [] for entity_id in batch}
+        unattributed = 0
+        for item in response:
+            entity_id = cls.log_volume_entity_id(item)
+            if entity_id is None and len(batch) == 1:
+                entity_id = batch[0]
+            if entity_id in by_entity:
+                by_entity[entity_id].append(item)
+            else:
+                unattributed += 1
+
+        if unattributed:
+            logging.warning(f"{unattributed} log volume items could not be attributed to an entity, batch will be refetched per entity")
+            return {entity_id: None for entity_id in batch}
+        return by_entity
+
+    def fetch_log_volume_windows(self, window_entity_ids, max_workers=None):
+        """Fetch the log volume of {(start, end) window: entity IDs} with up to max_workers windows in flight.
+        Entities whose request failed are retried per window (LOG_VOLUME_WINDOW_RETRIES rounds) instead of
+        redoing the whole range; unattributable responses would fail the same way again and are not retried.
+        Returns {window: {entity ID: response, or None}}"""
+        workers = max_workers or self.LOG_VOLUME_WORKERS
+        results = {window: {} for window in window_entity_ids}
+        pending = {window: list(entity_ids) for window, entity_ids in window_entity_ids.items() if entity_ids}
+
+        def fetch(window):
+            return self.fetch_log_volume_for_entities_with_errors(pending[window], start=window[0], end=window[1])
+
+        for attempt in range(self.LOG_VOLUME_WINDOW_RETRIES + 1):
+            if not pending:
+                break
+            if attempt:
+                logging.warning(f"Retrying {len(pending)} failed log volume windows (attempt {attempt + 1})")
+            else:
+                logging.info(f"Fetching {len(pending)} log volume windows with {workers} workers")
+
+            if workers <= 1 or len(pending) <= 1:
+                fetched = {window: fetch(window) for window in pending}
+            else:
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    fetched = dict(zip(pending, executor.map(fetch, pending)))
+
+            failed = {}
+            for window, (log_volumes, errors) in fetched.items():
+                results[window].update(log_volumes)
+                if errors:
+                    failed[window] = list(errors)
+            pending = failed
+
+        for window, entity_ids in pending.items():
+            logging.error(f"Log volume of {window[0]} to {window[1]} failed for {len(entity_ids)} entities")
+        return results
+
+    def fetch_log_volume_range(self, entity_ids, start, end, window=None, max_workers=None):
+        """Log volume of many entities from start to end, fetched as parallel day or week windows and merged
+        into one response per entity. Returns {entity ID: response, or None if one of its windows failed}.
+        Pass the length of the range to DataProcessor.process_log_volume to get the per day rates right."""
+        entity_ids = list(entity_ids)
+        windows = self.plan_date_windows(start, end, window or self.LOG_VOLUME_WINDOW)
+        by_window = self.fetch_log_volume_windows({window: entity_ids for window in windows}, max_workers)
+        return {entity_id: self.merge_log_volume_windows([by_window[window].get(entity_id) for window in windows]) for entity_id in entity_ids}
+
+    def fetch_alarms(self, entity):
+        params = self.alarm_params(entity)
+        logging.info(f"Fetching Alarms")
+        response, error = self.fetch_alarms_with_pagination('alarms/', params, method='GET')
+        if error:
+            logging.error(f"Error fetching alarms: {error}")
+            return None
+        return response
+
+    def iter_alarms(self, entity=None):
+        """Stream today's silent log source alarms (of one entity, or all) record by record"""
+        logging.info(f"Streaming Alarms")
+        return self.iter_records(self.make_alarm_api_call, 'alarms/', self.alarm_params(entity), data_key='alarmsSearchDetails')
+
+    def fetch_all_alarms(self):
+        """Fetch today's silent log source alarms of every entity in one pass"""
+        logging.info(f"Fetching Alarms for all entities")
+        response, error = self.fetch_alarms_with_pagination('alarms/', self.alarm_params(), method='GET')
+        if error:
+            logging.error(f"Error fetching alarms: {error}")
+            return None
+        return response
+
+    def fetch_alarm_detail(self, alarm_id):
+        """Fetch the events of a single alarm. Returns (response, None) or (None, error message)"""
+        resource = f"/alarms/{alarm_id}/events"
+        response, error = self.make_alarm_api_call(resource, method='GET')
+
+        if error:
+            return None, error
+        if not response:
+            return None, "No response received"
+        return response, None
+
+    def fetch_alarm_details_with_errors(self, alarm_ids, max_workers=None):
+        """Fetch alarm details concurrently. Returns (details in input order, {alarm_id: error})"""
+        alarm_ids = list(alarm_ids)
+        workers = max_workers or self.ALARM_DETAIL_WORKERS
+        results = [None] * len(alarm_ids)
+        errors = {}
+
+        logging.info(f"Fetching alarm details for {len(alarm_ids)} alarms with {workers} workers")
+        if workers <= 1 or len(alarm_ids) <= 1:
+            for index, alarm_id in enumerate(alarm_ids):
+                results[index] = self.fetch_alarm_detail(alarm_id)
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {executor.submit(self.fetch_alarm_detail, alarm_id): index for index, alarm_id in enumerate(alarm_ids)}
+                for future in as_completed(futures):
+                    results[futures[future]] = future.result()
+
+        alarm_details = []
+        for alarm_id, (response, error) in zip(alarm_ids, results):
+            if error:
+                errors[alarm_id] = error
+                continue
+            alarm_details.append(response)
+
+        return alarm_details, errors
+
+    def fetch_alarm_details(self, alarm_ids, max_workers=None):
+        logging.info("Fetching alarm details")
+        alarm_details, errors = self.fetch_alarm_details_with_errors(alarm_ids, max_workers)
+
+        for alarm_id, error in errors.items():
+            logging.error(f"Error fetching alarm details for alarm ID {alarm_id}: {error}")
+
+        return alarm_details
+
+
+    #######################################################################################################################################################################
+    #######################################################################################################################################################################
@@ -1,203 +1,255 @@
-import csv
-import logging
-
-# Initialize logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-
-class DataProcessor:
-
-    @staticmethod
-    def process_host_data(data):
-        """Process raw API data to extract specific fields"""
-        if not data:
-            logging.warning("No data provided to process host data.")
-            return []
-
-        processed_data = []
-        for item in data:
-            host_identifiers = item.get('hostIdentifiers', [])
-            ip_addresses = [identifier['value'] for identifier in host_identifiers if identifier.get('type') == 'IPAddress']
-            host_info = {
-                'ID': item.get('id'),
-                'Entity ID': item.get('entity', {}).get('id'),
-                'Entity Name': item.get('entity', {}).get('name'),
-                'Hostname': item.get('name'),
-                'IP Addresses': ip_addresses
-            }
-            processed_data.append(host_info)
-
-        logging.info(f"Processed {len(processed_data)} host data items.")
-        return processed_data
-
-    @staticmethod
-    def process_entities(data):
-        """Process raw API data to extract specific fields, excluding entities starting with 'zzz'"""
-        if not data:
-            logging.warning("No data provided to process entities.")
-            return []
-
-        processed_data = []
-        for item in data:
-            entity_name = item.get('name', '')
-            if not entity_name.startswith('zzz') and not entity_name.startswith('NYKUNDE'):
-                host_info = {
-                    'Entity ID': item.get('id'),
-                    'Entity Name': entity_name
-                }
-                processed_data.append(host_info)
-
-        logging.info(f"Processed {len(processed_data)} entity data items.")
-        return processed_data
-
-    @staticmethod
-    def process_log_source_overview(data, entity):
-        """Process raw API data to count occurrences of each log source type for a specific entity"""
-        if not data:
-            logging.warning("No data provided to process log source overview.")
-            return []
-
-        log_source_counts = {}
-        for item in data:
-            entity_name = item.get('entity', {}).get('name')
-            if entity_name != entity:
-                continue
-
-            log_source_name = item.get('logSourceType', {}).get('name')
-            if log_source_name and not log_source_name.startswith('LogRhythm'):
-                log_source_counts[log_source_name] = log_source_counts.get(log_source_name, 0) + 1
-
-        grand_total = sum(log_source_counts.values())
-        processed_data = [{'Log Source Type': log_source, 'Count': count} for log_source, count in log_source_counts.items()]
-        processed_data.append({'Log Source Type': 'Total Log Sources', 'Count': grand_total})
-
-        logging.info(f"Processed log source overview for entity {entity}.")
-        return processed_data
-
-    @staticmethod
-    def process_pending_log_sources(data, entity):
-        """Process raw API data to extract specific fields and calculate the grand total."""
-        if not data:
-            logging.warning("No data provided to process pending log sources.")
-            return []
-
-        processed_data = []
-        total_count = 0
-        for item in data:
-            collection_host_info = item.get('collectionHost', '')
-            entity_name = collection_host_info.split(', ')[0].split(': ')[1] if ': ' in collection_host_info else ''
-            
-            if entity_name == entity:
-                host_info = {
-                    'Log Source Name': item.get('name'),
-                    'IP Addresses': item.get('ip')
-                }
-                processed_data.append(host_info)
-                total_count += 1
-
-        processed_data.append({'Log Source Name': 'Total Pending Log Sources', 'IP Addresses': total_count})
-        logging.info(f"Processed {total_count} pending log sources for entity {entity}.")
-        return processed_data
-
-    @staticmethod
-    def process_log_volume(api_result):
-        if not api_result:
-            logging.warning("No data provided to process log volume.")
-            return []
-
-        processed_data = []
-        seconds_per_day = 86400
-        days_per_week = 7
-
-        for item in api_result:
-            log_source_info = item.get('logSourceTypeInfo', [])
-            for log_info in log_source_info:
-                log_source_type = log_info.get('logSourceType')
-                if log_source_type.startswith("LogRhythm"):
-                    continue
-
-                logs_count = int(log_info.get('logsCount', 0))
-                logs_per_day = round(logs_count / days_per_week)
-                logs_per_sec = round(logs_count / (days_per_week * seconds_per_day))
-                processed_entry = {
-                    'Log Source Type': log_source_type,
-                    'Logs Count': f"{logs_count:,}",
-                    'Logs/D': f"{logs_per_day:,}",
-                    'Logs/S': f"{logs_per_sec:,}"
-                }
-                processed_data.append(processed_entry)
-
-        processed_data.sort(key=lambda x: x['Log Source Type'])
-        total_logs = int(api_result[-1].get('totalLogs', 0))
-        total_logs_per_day = round(total_logs / days_per_week)
-        total_logs_per_sec = round(total_logs / (days_per_week * seconds_per_day))
-        processed_data.append({'Log Source Type': 'Total Logs', 'Logs Count': f"{total_logs:,}", 'Logs/D': f"{total_logs_per_day:,}", 'Logs/S': f"{total_logs_per_sec:,}"})
-
-        logging.info("Processed log volume data.")
-        return processed_data
-
-    @staticmethod
-    def extract_alarm_ids(alarms):
-        alarm_ids = []
-        for alarm in alarms:
-            alarm_id = alarm.get('alarmId')
-            if alarm_id is not None:
-                alarm_ids.append(alarm_id)
-
-        logging.info(f"Extracted {len(alarm_ids)} alarm IDs.")
-        return alarm_ids
-
-    @staticmethod
-    def extract_alarm_details(alarm_details, entity):
-        if not alarm_details:
-            logging.warning("No alarm details provided for extraction.")
-            return []
-
-        extracted_data = []
-        total_alarms_count = 0  # Initialize counter for total number of alarms
-
-        for detail in alarm_details:
-            alarm_event = detail['alarmEventsDetails'][0]
-            entity_name = alarm_event.get('entityName', 'N/A')
-            if entity_name != entity:
-                continue  # Skip this detail if entity does not match
-
-            # Extract the required information
-            log_source_name = alarm_event.get('logSourceName', 'N/A')
-            log_date = alarm_event.get('logDate', 'N/A')
-            log_source_host_name = alarm_event.get('logSourceHostName', 'N/A')
-            
-            # Append the extracted information to the list, without the entity name
-            extracted_data.append({
-                'Log Source Name': log_source_name,
-                'Log Source Host Name': log_source_host_name,
-                'Log Date': log_date
-            })
-            total_alarms_count += 1  # Increment the alarm counter
-
-        # Optionally, append the total alarms count at the end if needed
-        extracted_data.append({
-            'Log Source Name': 'Total Alarms',
-            'Log Source Host Name':'',
-            'Log Date': total_alarms_count
-        })
-
-        logging.info(f"Processed {total_alarms_count} alarm details for the specified entity.")
-        return extracted_data
-
-    @staticmethod
-    def write_to_csv(data, filename):
-        if not data:
-            logging.warning(f"No data to write to {filename}.")
-            return
-
-        try:
-            with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-                fieldnames = data[0].keys()
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                writer.writeheader()
-                for row in data:
-                    writer.writerow(row)
-
-            logging.info(f"Data successfully written to {filename}")
-        except Exception as e:
-            logging.error(f"Error writing to CSV file {filename}: {e}")
+import csv
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from log_volume_store import LogVolumeStore
+from table_data import Table, LogSourceCountRow, LogVolumeRow, LogVolumeTrendRow, MissingLogRow, PendingLogSourceRow
+
+# Initialize logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Background writer for the optional CSV exports, so the slow share does not block rendering.
+# Created lazily per process so forked report workers never inherit the parent's threads.
+_csv_executor = None
+_csv_executor_pid = None
+
+def _get_csv_executor():
+    global _csv_executor, _csv_executor_pid
+    if _csv_executor is None or _csv_executor_pid != os.getpid():
+        _csv_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='csv-export')
+        _csv_executor_pid = os.getpid()
+    return _csv_executor
+
+class DataProcessor:
+
+    @staticmethod
+    def process_host_data(data):
+        """Process raw API data to extract specific fields"""
+        if not data:
+            logging.warning("No data provided to process host data.")
+            return []
+
+        processed_data = []
+        for item in data:
+            host_identifiers = item.get('hostIdentifiers', [])
+            ip_addresses = [identifier['value'] for identifier in host_identifiers if identifier.get('type') == 'IPAddress']
+            host_info = {
+                'ID': item.get('id'),
+                'Entity ID': item.get('entity', {}).get('id'),
+                'Entity Name': item.get('entity', {}).get('name'),
+                'Hostname': item.get('name'),
+                'IP Addresses': ip_addresses
+            }
+            processed_data.append(host_info)
+
+        logging.info(f"Processed {len(processed_data)} host data items.")
+        return processed_data
+
+    @staticmethod
+    def process_entities(data):
+        """Process raw API data to extract specific fields, excluding entities starting with 'zzz'"""
+        if not data:
+            logging.warning("No data provided to process entities.")
+            return []
+
+        processed_data = []
+        for item in data:
+            entity_name = item.get('name', '')
+            if not entity_name.startswith('zzz') and not entity_name.startswith('NYKUNDE'):
+                host_info = {
+                    'Entity ID': item.get('id'),
+                    'Entity Name': entity_name
+                }
+                processed_data.append(host_info)
+
+        logging.info(f"Processed {len(processed_data)} entity data items.")
+        return processed_data
+
+    @staticmethod
+    def process_log_source_overview(data, entity):
+        """Process raw API data to count occurrences of each log source type for a specific entity.
+        Accepts any iterable of log sources (e.g. a streamed fetch) and counts them as they arrive."""
+        if data is None:
+            logging.warning("No data provided to process log source overview.")
+            return Table()
+
+        log_source_counts = {}
+        items_seen = 0
+        for item in data:
+            items_seen += 1
+            entity_name = item.get('entity', {}).get('name')
+            if entity_name != entity:
+                continue
+
+            log_source_name = item.get('logSourceType', {}).get('name')
+            if log_source_name and not log_source_name.startswith('LogRhythm'):
+                log_source_counts[log_source_name] = log_source_counts.get(log_source_name, 0) + 1
+
+        if not items_seen:
+            logging.warning("No data provided to process log source overview.")
+            return Table()
+
+        grand_total = sum(log_source_counts.values())
+        processed_data = [LogSourceCountRow(log_source, count) for log_source, count in log_source_counts.items()]
+        processed_data.append(LogSourceCountRow('Total Log Sources', grand_total))
+
+        logging.info(f"Processed log source overview for entity {entity}.")
+        return Table.from_rows(LogSourceCountRow, processed_data)
+
+    @staticmethod
+    def pending_log_source_entity(item):
+        """Return the entity name encoded in a pending log source's collectionHost ("Entity: <name>, ...")"""
+        collection_host_info = item.get('collectionHost') or ''
+        return collection_host_info.split(', ')[0].split(': ')[1] if ': ' in collection_host_info else ''
+
+    @staticmethod
+    def process_pending_log_sources(data, entity):
+        """Process raw API data to extract specific fields and calculate the grand total.
+        Accepts the full pending queue, an entity's slice of it or any other iterable of pending log sources;
+        an empty slice still yields the total row."""
+        if data is None:
+            logging.warning("No data provided to process pending log sources.")
+            return Table()
+
+        processed_data = []
+        total_count = 0
+        for item in data:
+            entity_name = DataProcessor.pending_log_source_entity(item)
+
+            if entity_name == entity:
+                processed_data.append(PendingLogSourceRow(item.get('name'), item.get('ip')))
+                total_count += 1
+
+        processed_data.append(PendingLogSourceRow('Total Pending Log Sources', total_count))
+        logging.info(f"Processed {total_count} pending log sources for entity {entity}.")
+        return Table.from_rows(PendingLogSourceRow, processed_data)
+
+    @staticmethod
+    def process_log_volume(api_result, days=7):
+        """Process raw log volume data covering the given number of days (a week by default, or the length of
+        a merged APIHandler.fetch_log_volume_range) into logs per period/day/second per log source type.
+        Counts stay integers; thousands separators are added when the table is rendered."""
+        if not api_result:
+            logging.warning("No data provided to process log volume.")
+            return Table()
+
+        processed_data = []
+        seconds_per_day = 86400
+
+        for item in api_result:
+            log_source_info = item.get('logSourceTypeInfo', [])
+            for log_info in log_source_info:
+                log_source_type = log_info.get('logSourceType')
+                if log_source_type.startswith("LogRhythm"):
+                    continue
+
+                logs_count = int(log_info.get('logsCount', 0))
+                logs_per_day = round(logs_count / days)
+                logs_per_sec = round(logs_count / (days * seconds_per_day))
+                processed_data.append(LogVolumeRow(log_source_type, logs_count, logs_per_day, logs_per_sec))
+
+        processed_data.sort(key=lambda row: row.log_source_type)
+        total_logs = int(api_result[-1].get('totalLogs', 0))
+        total_logs_per_day = round(total_logs / days)
+        total_logs_per_sec = round(total_logs / (days * seconds_per_day))
+        processed_data.append(LogVolumeRow('Total Logs', total_logs, total_logs_per_day, total_logs_per_sec))
+
+        logging.info("Processed log volume data.")
+        return Table.from_rows(LogVolumeRow, processed_data)
+
+    @staticmethod
+    def process_log_volume_trend(weekly_totals):
+        """Weekly log volume trend (as returned by LogVolumeStore.weekly_totals) with the change from
+        week to week and, on the last row, the MPS growth over the whole period"""
+        if not weekly_totals:
+            logging.warning("No data provided to process log volume trend.")
+            return Table()
+
+        processed_data = []
+        previous_per_day = None
+        for week in weekly_totals:
+            # Averages over the stored days, so a partially stored week does not look like a drop
+            per_day = week['totalLogs'] / week['days']
+            change = (per_day - previous_per_day) / previous_per_day * 100.0 if previous_per_day else None
+            processed_data.append(LogVolumeTrendRow(week['week'], week['totalLogs'], round(per_day), round(per_day / 86400),
+                                                    None if change is None else round(change, 1)))
+            previous_per_day = per_day
+
+        growth = LogVolumeStore.mps_growth(weekly_totals)
+        processed_data.append(LogVolumeTrendRow('MPS Growth', None, None, None, None if growth is None else round(growth, 1)))
+
+        logging.info(f"Processed log volume trend over {len(weekly_totals)} weeks.")
+        return Table.from_rows(LogVolumeTrendRow, processed_data)
+
+    @staticmethod
+    def extract_alarm_ids(alarms):
+        """Collect the alarm IDs from any iterable of alarms (e.g. a streamed fetch)"""
+        alarm_ids = []
+        if alarms is None:
+            logging.warning("No alarms provided to extract alarm IDs.")
+            return alarm_ids
+
+        for alarm in alarms:
+            alarm_id = alarm.get('alarmId')
+            if alarm_id is not None:
+                alarm_ids.append(alarm_id)
+
+        logging.info(f"Extracted {len(alarm_ids)} alarm IDs.")
+        return alarm_ids
+
+    @staticmethod
+    def extract_alarm_details(alarm_details, entity):
+        if not alarm_details:
+            logging.warning("No alarm details provided for extraction.")
+            return Table()
+
+        extracted_data = []
+        total_alarms_count = 0  # Initialize counter for total number of alarms
+
+        for detail in alarm_details:
+            alarm_event = detail['alarmEventsDetails'][0]
+            entity_name = alarm_event.get('entityName', 'N/A')
+            if entity_name != entity:
+                continue  # Skip this detail if entity does not match
+
+            # Extract the required information
+            log_source_name = alarm_event.get('logSourceName', 'N/A')
+            log_date = alarm_event.get('logDate', 'N/A')
+            log_source_host_name = alarm_event.get('logSourceHostName', 'N/A')
+            
+            # Append the extracted information to the list, without the entity name
+            extracted_data.append(MissingLogRow(log_source_name, log_source_host_name, log_date))
+            total_alarms_count += 1  # Increment the alarm counter
+
+        # Optionally, append the total alarms count at the end if needed
+        extracted_data.append(MissingLogRow('Total Alarms', '', total_alarms_count))
+
+        logging.info(f"Processed {total_alarms_count} alarm details for the specified entity.")
+        return Table.from_rows(MissingLogRow, extracted_data)
+
+    @staticmethod
+    def write_to_csv(data, filename):
+        """Write a Table (or a list of dicts) to a CSV file"""
+        table = data if isinstance(data, Table) else Table.from_records(data)
+        if not table:
+            logging.warning(f"No data to write to {filename}.")
+            return
+
+        try:
+            with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
+                writer = csv.writer(csvfile)
+                writer.writerows(table.as_text_rows())
+
+            logging.info(f"Data successfully written to {filename}")
+        except Exception as e:
+            logging.error(f"Error writing to CSV file {filename}: {e}")
+
+    @staticmethod
+    def write_to_csv_async(data, filename):
+        """Queue a CSV export on the background writer and return its future"""
+        return _get_csv_executor().submit(DataProcessor.write_to_csv, data, filename)
+
+    @staticmethod
+    def wait_for_csv_exports(futures):
+        for future in futures:
+            future.result()
@@ -0,0 +1,142 @@
+import logging
+import numpy as np
+from table_data import Table, format_percent, format_thousands
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+SECONDS_PER_DAY = 86400
+
+
+class LogVolumeEngine:
+    """Vectorized log volume aggregation for many entities and periods at once.
+
+    The log volume responses (as returned by APIHandler.fetch_entity_log_volume) are loaded into
+    one int64 array of shape (entities, periods, log source types) plus the reported totals of
+    shape (entities, periods). Rates, totals, period-over-period deltas and percentiles are then
+    plain array operations instead of nested dict loops."""
+
+    def __init__(self, entities, periods, log_source_types, counts, totals, period_days):
+        self.entities = list(entities)
+        self.periods = list(periods)
+        self.log_source_types = list(log_source_types)
+        self.counts = counts            # (entities, periods, types)
+        self.totals = totals            # (entities, periods), 'totalLogs' as reported by the API
+        self.period_days = period_days  # (periods,)
+
+    @classmethod
+    def from_responses(cls, responses, periods=None, period_days=7, exclude_prefix='LogRhythm'):
+        """Build the engine from {entity: {period: log volume response}}.
+
+        periods fixes the order of the period axis (oldest first); by default the periods are sorted.
+        period_days is the length of every period in days, or a {period: days} mapping.
+        Log source types starting with exclude_prefix are skipped, like in DataProcessor.process_log_volume."""
+        entities = list(responses)
+        if periods is None:
+            periods = sorted({period for by_period in responses.values() for period in by_period})
+
+        # First pass collects the log source type axis
+        log_source_types = sorted({
+            log_info.get('logSourceType')
+            for by_period in responses.values()
+            for api_result in by_period.values()
+            for item in api_result or []
+            for log_info in item.get('logSourceTypeInfo', [])
+            if log_info.get('logSourceType') and not log_info.get('logSourceType').startswith(exclude_prefix)
+        })
+        type_index = {log_source_type: index for index, log_source_type in enumerate(log_source_types)}
+        period_index = {period: index for index, period in enumerate(periods)}
+
+        counts = np.zeros((len(entities), len(periods), len(log_source_types)), dtype=np.int64)
+        totals = np.zeros((len(entities), len(periods)), dtype=np.int64)
+
+        # Second pass fills the arrays, one flat index/value batch per entity
+        for e, entity in enumerate(entities):
+            flat_index = []
+            flat_values = []
+            for period, api_result in responses[entity].items():
+                if period not in period_index or not api_result:
+                    continue
+                p = period_index[period]
+                totals[e, p] = int(api_result[-1].get('totalLogs', 0))
+                for item in api_result:
+                    for log_info in item.get('logSourceTypeInfo', []):
+                        t = type_index.get(log_info.get('logSourceType'))
+                        if t is None:
+                            continue
+                        flat_index.append(p * len(log_source_types) + t)
+                        flat_values.append(int(log_info.get('logsCount', 0)))
+            if flat_index:
+                np.add.at(counts[e].reshape(-1), np.asarray(flat_index), np.asarray(flat_values, dtype=np.int64))
+
+        if isinstance(period_days, dict):
+            days = np.array([period_days[period] for period in periods], dtype=np.float64)
+        else:
+            days = np.full(len(periods), float(period_days))
+
+        logging.info(f"Loaded log volume for {len(entities)} entities, {len(periods)} periods and {len(log_source_types)} log source types")
+        return cls(entities, periods, log_source_types, counts, totals, days)
+
+    #######################################################################################################################################################################
+    #######################################################################################################################################################################
+
+    def logs_per_day(self):
+        """(entities, periods, types) average logs per day, rounded like process_log_volume"""
+        return np.rint(self.counts / self.period_days[None, :, None]).astype(np.int64)
+
+    def logs_per_sec(self):
+        """(entities, periods, types) average logs per second (MPS), rounded like process_log_volume"""
+        return np.rint(self.counts / (self.period_days[None, :, None] * SECONDS_PER_DAY)).astype(np.int64)
+
+    def total_mps(self):
+        """(entities, periods) unrounded MPS from the reported totals"""
+        return self.totals / (self.period_days[None, :] * SECONDS_PER_DAY)
+
+    def type_totals(self):
+        """(entities, periods) sum over the non-excluded log source types"""
+        return self.counts.sum(axis=2)
+
+    def portfolio_totals(self):
+        """(periods, types) counts summed over all entities"""
+        return self.counts.sum(axis=0)
+
+    def period_deltas(self):
+        """(entities, periods - 1) change of the reported totals from one period to the next"""
+        return np.diff(self.totals, axis=1)
+
+    def period_change_percent(self):
+        """(entities, periods - 1) percentage change of the reported totals, NaN where the earlier period is 0"""
+        previous = self.totals[:, :-1].astype(np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change = np.where(previous > 0, np.diff(self.totals, axis=1) / previous * 100.0, np.nan)
+        return change
+
+    def mps_percentiles(self, percentiles=(50, 90, 95, 99)):
+        """{percentile: (periods,) MPS across entities}, ignoring entities without data in a period"""
+        mps = np.where(self.totals > 0, self.total_mps(), np.nan)
+        values = np.nanpercentile(mps, percentiles, axis=0) if len(self.entities) else np.full((len(percentiles), len(self.periods)), np.nan)
+        return dict(zip(percentiles, values))
+
+    #######################################################################################################################################################################
+    #######################################################################################################################################################################
+
+    def mps_overview_table(self, period=None):
+        """Portfolio-wide MPS overview for one period (the latest by default), largest entities first.
+        Ready for ExcelOperations.table_to_excel(..., format_mps_overview=True)."""
+        p = len(self.periods) - 1 if period is None else self.periods.index(period)
+        totals = self.totals[:, p]
+        per_day = np.rint(totals / self.period_days[p]).astype(np.int64)
+        per_sec = np.rint(totals / (self.period_days[p] * SECONDS_PER_DAY)).astype(np.int64)
+        change = self.period_change_percent()[:, p - 1] if p > 0 else np.full(len(self.entities), np.nan)
+
+        order = np.argsort(-totals, kind='stable')
+        rows = [[self.entities[e], int(totals[e]), int(per_day[e]), int(per_sec[e]), None if np.isnan(change[e]) else round(float(change[e]), 1)]
+                for e in order]
+
+        grand_total = int(totals.sum())
+        rows.append(['Total Logs', grand_total, int(round(grand_total / self.period_days[p])),
+                     int(round(grand_total / (self.period_days[p] * SECONDS_PER_DAY))), None])
+
+        header = ['Entity', 'Logs Count', 'Logs/D', 'Logs/S', 'Change']
+        formats = [None, format_thousands, format_thousands, format_thousands, format_percent]
+        return Table(header, rows, formats=formats)
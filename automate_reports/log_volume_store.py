@@ -0,0 +1,183 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+SECONDS_PER_DAY = 86400
+
+
+class LogVolumeStore:
+    """Local SQLite history of daily log counts per entity and log source type.
+
+    Every run only asks the metrics API for the days it does not have yet (one logvolume/ request per
+    day and batch of entities, minDate = the day, maxDate = the next day), so the weekly report and the
+    quarter-long trend come from the store instead of re-querying the whole range each time. Only
+    completed days (before today) are stored, and days whose counts may still have been arriving when they
+    were fetched are fetched again until they settle."""
+
+    # A stored day is final once it was fetched at least this many hours after it ended
+    SETTLE_HOURS = 48
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS daily_log_volume (
+                entity_id INTEGER NOT NULL,
+                day TEXT NOT NULL,
+                log_source_type TEXT NOT NULL,
+                logs_count INTEGER NOT NULL,
+                PRIMARY KEY (entity_id, day, log_source_type)
+            );
+            CREATE TABLE IF NOT EXISTS stored_days (
+                entity_id INTEGER NOT NULL,
+                day TEXT NOT NULL,
+                total_logs INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (entity_id, day)
+            );""")
+        self.connection.commit()
+        logging.info(f"Using log volume history at {path}")
+
+    def close(self):
+        with self._lock:
+            self.connection.close()
+
+    @staticmethod
+    def days(start, end):
+        """Dates from start up to, not including, end"""
+        return [start + timedelta(days=offset) for offset in range((end - start).days)]
+
+    def stored_days(self, entity_id, start, end):
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT day FROM stored_days WHERE entity_id = ? AND day >= ? AND day < ?",
+                (entity_id, start.isoformat(), end.isoformat())).fetchall()
+        return {date.fromisoformat(day) for day, in rows}
+
+    def settled_days(self, entity_id, start, end):
+        """Stored days that were fetched at least SETTLE_HOURS after they ended"""
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT day, fetched_at FROM stored_days WHERE entity_id = ? AND day >= ? AND day < ?",
+                (entity_id, start.isoformat(), end.isoformat())).fetchall()
+        settled = set()
+        for day, fetched_at in rows:
+            day_end = datetime.combine(date.fromisoformat(day) + timedelta(days=1), datetime.min.time())
+            if fetched_at >= day_end.timestamp() + self.SETTLE_HOURS * 3600:
+                settled.add(date.fromisoformat(day))
+        return settled
+
+    def missing_days(self, entity_ids, start, end):
+        """{day: [entity IDs without that day, or with a day that has not settled yet]} for the days from start to end"""
+        missing = {}
+        for entity_id in entity_ids:
+            stored = self.settled_days(entity_id, start, end)
+            for day in self.days(start, end):
+                if day not in stored:
+                    missing.setdefault(day, []).append(entity_id)
+        return missing
+
+    def store_day(self, entity_id, day, api_result):
+        """Store one entity's logvolume/ response for a single day (counts summed per log source type)"""
+        counts = {}
+        for item in api_result:
+            for log_info in item.get('logSourceTypeInfo', []):
+                log_source_type = log_info.get('logSourceType')
+                if log_source_type:
+                    counts[log_source_type] = counts.get(log_source_type, 0) + int(log_info.get('logsCount', 0))
+        total_logs = int(api_result[-1].get('totalLogs', 0)) if api_result else 0
+
+        with self._lock:
+            self.connection.execute("DELETE FROM daily_log_volume WHERE entity_id = ? AND day = ?", (entity_id, day.isoformat()))
+            self.connection.executemany(
+                "INSERT INTO daily_log_volume (entity_id, day, log_source_type, logs_count) VALUES (?, ?, ?, ?)",
+                [(entity_id, day.isoformat(), log_source_type, count) for log_source_type, count in counts.items()])
+            self.connection.execute(
+                "INSERT OR REPLACE INTO stored_days (entity_id, day, total_logs, fetched_at) VALUES (?, ?, ?, ?)",
+                (entity_id, day.isoformat(), total_logs, time.time()))
+            self.connection.commit()
+
+    def update(self, api_handler, entity_ids, days=7, today=None):
+        """Fetch and store the missing days among the last days (up to yesterday) for the given entities.
+        The days are fetched as parallel one-day windows (APIHandler.fetch_log_volume_windows); days whose
+        fetch still fails stay missing and are retried on the next run."""
+        end = today or date.today()
+        start = end - timedelta(days=days)
+        missing = self.missing_days(entity_ids, start, end)
+        if not missing:
+            logging.info(f"Log volume history is up to date for {len(entity_ids)} entities")
+            return 0
+
+        logging.info(f"Fetching {len(missing)} missing or unsettled days of log volume history")
+        windows = {(day, day + timedelta(days=1)): day_entity_ids for day, day_entity_ids in missing.items()}
+        stored = 0
+        for (day, _), log_volumes in sorted(api_handler.fetch_log_volume_windows(windows).items()):
+            for entity_id, api_result in log_volumes.items():
+                if api_result is not None:
+                    self.store_day(entity_id, day, api_result)
+                    stored += 1
+        return stored
+
+    #######################################################################################################################################################################
+    #######################################################################################################################################################################
+
+    def log_volume_response(self, entity_id, start, end):
+        """The entity's counts from start to end in the shape of a logvolume/ response (what
+        DataProcessor.process_log_volume consumes), or None if any day of the range is missing"""
+        if len(self.stored_days(entity_id, start, end)) < (end - start).days:
+            return None
+
+        with self._lock:
+            counts = self.connection.execute(
+                "SELECT log_source_type, SUM(logs_count) FROM daily_log_volume "
+                "WHERE entity_id = ? AND day >= ? AND day < ? GROUP BY log_source_type ORDER BY log_source_type",
+                (entity_id, start.isoformat(), end.isoformat())).fetchall()
+            total_logs = self.connection.execute(
+                "SELECT COALESCE(SUM(total_logs), 0) FROM stored_days WHERE entity_id = ? AND day >= ? AND day < ?",
+                (entity_id, start.isoformat(), end.isoformat())).fetchone()[0]
+
+        return [{
+            'logSourceTypeInfo': [{'logSourceType': log_source_type, 'logsCount': count} for log_source_type, count in counts],
+            'totalLogs': total_logs
+        }]
+
+    def weekly_totals(self, entity_id, weeks=13, today=None):
+        """Total logs per week for the last weeks (oldest first): [{'week': first day, 'days': stored days,
+        'totalLogs': total}]. Weeks without any stored day are left out."""
+        end = today or date.today()
+        start = end - timedelta(days=7 * weeks)
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT day, total_logs FROM stored_days WHERE entity_id = ? AND day >= ? AND day < ? ORDER BY day",
+                (entity_id, start.isoformat(), end.isoformat())).fetchall()
+
+        totals = {}
+        for day, total_logs in rows:
+            week = start + timedelta(days=(date.fromisoformat(day) - start).days // 7 * 7)
+            entry = totals.setdefault(week, {'week': week.isoformat(), 'days': 0, 'totalLogs': 0})
+            entry['days'] += 1
+            entry['totalLogs'] += total_logs
+        return [totals[week] for week in sorted(totals)]
+
+    @staticmethod
+    def mps_growth(weekly_totals):
+        """Percent change of the average MPS from the first to the last week, None without two weeks of data"""
+        if len(weekly_totals) < 2:
+            return None
+        first, last = weekly_totals[0], weekly_totals[-1]
+        first_mps = first['totalLogs'] / (first['days'] * SECONDS_PER_DAY)
+        last_mps = last['totalLogs'] / (last['days'] * SECONDS_PER_DAY)
+        if first_mps <= 0:
+            return None
+        return (last_mps - first_mps) / first_mps * 100.0
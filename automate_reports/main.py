@@ -1,175 +1,629 @@
-import os
-from datetime import datetime
-from data_fetcher import APIHandler
-from data_processor import DataProcessor
-from powerpoint_operations import PowerPointProcess
-
-    #######################################################################################################################################################################
-    #######################################################################################################################################################################
-
-# NOTE: Right now it is filtering fetches on entity. In final verison remove that, so it fetches everything at once.
-
-import os
-
-def clear_screen():
-    # Clear the console screen.
-    os.system('cls' if os.name == 'nt' else 'clear')
-
-def display_entities_and_select(processed_entities):
-    #clear_screen()
-    print("Select an option:")
-    print("[1] Single entity")
-    print("[2] Multiple entities")
-    print("[3] All entities")
-
-    choice = input("Enter your choice: ")
-    selected_entities = []
-
-    # Clear the screen after the choice is made
-    clear_screen()
-
-    # Sort entities alphabetically by name after the choice is made
-    processed_entities.sort(key=lambda x: x['Entity Name'])
-
-    if choice == "1":  # Single entity
-        for index, entity in enumerate(processed_entities, start=1):
-            print(f"[{index}] {entity['Entity Name']}")
-        entity_index = int(input("Enter the number of the entity: ")) - 1
-        selected_entities = [processed_entities[entity_index]]
-
-    elif choice == "2":  # Multiple entities
-        for index, entity in enumerate(processed_entities, start=1):
-            print(f"[{index}] {entity['Entity Name']}")
-        entity_indices = input("Enter the numbers of the entities (comma-separated): ")
-        selected_indices = [int(idx.strip()) - 1 for idx in entity_indices.split(',')]
-        selected_entities = [processed_entities[idx] for idx in selected_indices]
-
-    elif choice == "3":  # All entities
-        selected_entities = processed_entities
-
-    return selected_entities
-
-
-def ensure_directory_exists(dir_path):
-    if not os.path.exists(dir_path):
-        os.makedirs(dir_path)
-        print(f"Created directory: {dir_path}")
-    else:
-        print(f"Directory already exists: {dir_path}")
-
-#######################################################################################################################################################################
-#######################################################################################################################################################################
-
-def main():
-
-    # Create instances of classes
-    api_handler = APIHandler()
-    data_processor = DataProcessor()
-    powerpoint_processor = PowerPointProcess()
-
-    # Fetch entities from API
-    entities = api_handler.fetch_entities()
-
-    # Process entities and display for user selection
-    processed_entities = data_processor.process_entities(entities)
-    selected_entities = display_entities_and_select(processed_entities)
-
-    # Now you can loop over each selected entity and perform actions
-    for entity_info in selected_entities:
-        entity = entity_info['Entity Name']
-        entity_id = entity_info['Entity ID']
-
-        # Set relevant variables
-        csv_ext = ".csv"
-        #entity = ""
-        #entityId = 0
-        ppt_name = "Q3DIRTogMDR"
-        replacements = {
-            "<Kunden>": entity,
-            "<Dato>": datetime.now().strftime("%d/%m/%Y")
-        }
-
-        # Set relevant paths
-        # Set the base directory and entity name
-        base_directory = "Z:/Final Project/Data_export_tests"
-
-        # Create the entity-specific directory
-        entity_directory = os.path.join(base_directory, entity)
-        ensure_directory_exists(entity_directory)
-
-        template_path = "Z:/Final Project/Powerpoint Template/Statusmøde, Q3DIRTogMDR.pptx"  # Update with your actual template path
-
-        # Set slide numbers for PowerPoint
-        slide_number1 = 17  # Log Source Overview
-        slide_number2 = 18  # MPS/Log Volume
-        slide_number3 = 19  # Missing Logs/SLS Alarms
-        slide_number4 = 20  # Pending Logs
-
-        # Set filenames and filepaths
-        filename1 = f"{entity}_log_source_overview{csv_ext}"
-        csv_path1 = os.path.join(entity_directory, filename1)
-
-        filename2 = f"{entity}_log_volume{csv_ext}"
-        csv_path2 = os.path.join(entity_directory, filename2)
-
-        filename3 = f"{entity}_missing_logs{csv_ext}"
-        csv_path3 = os.path.join(entity_directory, filename3)
-
-        filename4 = f"{entity}_pending_log_sources{csv_ext}"
-        csv_path4 = os.path.join(entity_directory, filename4)
-
-#######################################################################################################################################################################
-#######################################################################################################################################################################
-
-        # API calls for fetching data
-        log_source_overview = api_handler.fetch_entity_log_source_overview(entity_id)
-        log_volume = api_handler.fetch_entity_log_volume(entity_id)
-        alarms = api_handler.fetch_alarms(entity)
-        alarm_ids = DataProcessor.extract_alarm_ids(alarms)
-        missing_logs = api_handler.fetch_alarm_details(alarm_ids)
-        pending_log_sources = api_handler.fetch_entity_pending_log_sources()
-
-#######################################################################################################################################################################
-#######################################################################################################################################################################
-
-        # Process data from API calls
-        processed_log_source_overview = DataProcessor.process_log_source_overview(log_source_overview, entity)
-        processed_log_volume = DataProcessor.process_log_volume(log_volume)
-        processed_missing_logs = DataProcessor.extract_alarm_details(missing_logs, entity)
-        processed_pending_log_sources = DataProcessor.process_pending_log_sources(pending_log_sources, entity)
-
-#######################################################################################################################################################################
-#######################################################################################################################################################################
-
-        # Write processed data from API calls to csv files
-        DataProcessor.write_to_csv(processed_log_source_overview, csv_path1)
-        DataProcessor.write_to_csv(processed_log_volume, csv_path2)
-        DataProcessor.write_to_csv(processed_missing_logs, csv_path3)
-        DataProcessor.write_to_csv(processed_pending_log_sources, csv_path4)
-
-#######################################################################################################################################################################
-#######################################################################################################################################################################
-
-
-        # Copy a PowerPoint template and rename it
-        copied_ppt_path = PowerPointProcess.copy_and_rename_ppt(template_path, entity_directory, entity, ppt_name)
-        # Replace placeholder text in PowerPoint
-        PowerPointProcess.replace_text_in_ppt(copied_ppt_path, replacements)
-
-        # Set arguments for adding data into PowerPoint
-        ppt_path = copied_ppt_path # Update with your actual path
-        table_details = [
-            (slide_number1, csv_path1, 0.5, 1.6),
-            (slide_number2, csv_path2, 1.2, 1.2),
-            (slide_number3, csv_path3, 0.5, 1.2),
-            (slide_number4, csv_path4, 1.2, 1.2)
-            # Add more as needed
-        ]
-        PowerPointProcess.add_tables_to_powerpoint(ppt_path, table_details)
-
-
-#######################################################################################################################################################################
-#######################################################################################################################################################################
-
-if __name__ == "__main__":
-    main()
+import os
+import sys
+import argparse
+import fnmatch
+import logging
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from data_fetcher import APIHandler, APIError
+from data_processor import DataProcessor
+from table_data import Table
+from powerpoint_operations import PowerPointProcess
+from excel_operations import ExcelOperations
+from log_volume_engine import LogVolumeEngine
+from bulk_fetcher import BulkDataset
+from report_config import ReportConfig
+from run_manifest import RunManifest
+from retry_policy import TokenBucket
+from log_volume_store import LogVolumeStore
+
+    #######################################################################################################################################################################
+    #######################################################################################################################################################################
+
+# NOTE: In bulk mode the log sources, alarms and pending log sources are fetched once for all entities and
+# partitioned per entity in memory. That downloads the whole tenant's inventory, so with the default bulk = auto
+# (--bulk / [run] bulk) it is only used when the entities to fetch are at least BULK_MIN_FRACTION of all entities;
+# smaller selections filter every fetch on entity. "on" and "off" force either path.
+BULK_MIN_FRACTION = 0.25
+
+# Export every processed table to CSV next to the deck (written in the background)
+WRITE_CSV = True
+
+# Portfolio-wide MPS overview of the selected entities (last week, with the change from the week before when the
+# log volume history has it), written to the output directory. Only a run over all entities writes MPS_OVERVIEW_NAME;
+# smaller selections get their own timestamped workbook so they never replace the portfolio overview
+WRITE_MPS_OVERVIEW = True
+MPS_OVERVIEW_NAME = "MPS_Overview.xlsx"
+
+# NOTE: Output and template paths, slide numbers, workers and the entity deadline (the maximum time one
+# entity report may spend) come from ReportConfig - pass an INI file with --config (see report_config.example.ini)
+
+# Persistent API response cache (entities, log sources, hosts). Disable with --no-cache, bypass with --refresh
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "api_cache.sqlite3")
+
+# Checkpoints of the current run (stage completion and payloads per entity), only kept when asked for: start a
+# resumable run with --manifest [file] and continue it after an interruption with --resume. Kept on a local disk
+# by default, the report workers write to it concurrently and SQLite locking is not reliable on network shares
+MANIFEST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "run_manifest.sqlite3")
+
+# Raw API payload snapshots: --record-snapshot writes one directory per run here, --replay-snapshot <dir>
+# re-runs processing and rendering from such a directory without any network access
+SNAPSHOT_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshots")
+
+# Per-run API telemetry (JSON summary and Prometheus textfile export). Point --telemetry-dir at the
+# node_exporter textfile collector directory to scrape it
+TELEMETRY_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "telemetry")
+
+# Local history of daily log counts per entity and log source type. Each run only fetches the days that are
+# not stored yet; the weekly log volume table and the quarter-long trend are read from it. Disable with --no-history
+LOG_VOLUME_HISTORY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "log_volume_history.sqlite3")
+TREND_WEEKS = 13
+
+import os
+
+def clear_screen():
+    # Clear the console screen.
+    os.system('cls' if os.name == 'nt' else 'clear')
+
+def display_entities_and_select(processed_entities):
+    #clear_screen()
+    print("Select an option:")
+    print("[1] Single entity")
+    print("[2] Multiple entities")
+    print("[3] All entities")
+
+    choice = input("Enter your choice: ")
+    selected_entities = []
+
+    # Clear the screen after the choice is made
+    clear_screen()
+
+    # Sort entities alphabetically by name after the choice is made
+    processed_entities.sort(key=lambda x: x['Entity Name'])
+
+    if choice == "1":  # Single entity
+        for index, entity in enumerate(processed_entities, start=1):
+            print(f"[{index}] {entity['Entity Name']}")
+        entity_index = int(input("Enter the number of the entity: ")) - 1
+        selected_entities = [processed_entities[entity_index]]
+
+    elif choice == "2":  # Multiple entities
+        for index, entity in enumerate(processed_entities, start=1):
+            print(f"[{index}] {entity['Entity Name']}")
+        entity_indices = input("Enter the numbers of the entities (comma-separated): ")
+        selected_indices = [int(idx.strip()) - 1 for idx in entity_indices.split(',')]
+        selected_entities = [processed_entities[idx] for idx in selected_indices]
+
+    elif choice == "3":  # All entities
+        selected_entities = processed_entities
+
+    return selected_entities
+
+def select_entities(processed_entities, patterns):
+    """Non-interactive selection: every entity matching one of the patterns - "all", an entity ID,
+    an exact name or a glob pattern on the name (case-insensitive)"""
+    patterns = [pattern.strip() for value in patterns for pattern in value.split(',') if pattern.strip()]
+    if any(pattern.lower() == 'all' for pattern in patterns):
+        return list(processed_entities)
+
+    selected_entities = []
+    for pattern in patterns:
+        matches = [entity_info for entity_info in processed_entities
+                   if str(entity_info['Entity ID']) == pattern
+                   or fnmatch.fnmatchcase(entity_info['Entity Name'].lower(), pattern.lower())]
+        if not matches:
+            logging.warning(f"No entity matches '{pattern}'")
+        for entity_info in matches:
+            if entity_info not in selected_entities:
+                selected_entities.append(entity_info)
+    return selected_entities
+
+def entity_priority(entity_data):
+    """Size estimate used to queue the largest customers first: inventory size, then weekly log volume"""
+    log_sources = entity_data.get('log_source_overview') or []
+    log_volume = entity_data.get('log_volume') or []
+    total_logs = int(log_volume[-1].get('totalLogs', 0)) if log_volume else 0
+    return len(log_sources), total_logs
+
+def order_entities(selected_entities, entity_data_by_name, order='size'):
+    if order == 'name':
+        return sorted(selected_entities, key=lambda entity_info: entity_info['Entity Name'])
+    return sorted(selected_entities, key=lambda entity_info: entity_priority(entity_data_by_name[entity_info['Entity Name']]), reverse=True)
+
+
+def ensure_directory_exists(dir_path):
+    if not os.path.exists(dir_path):
+        os.makedirs(dir_path)
+        print(f"Created directory: {dir_path}")
+    else:
+        print(f"Directory already exists: {dir_path}")
+
+# Seconds spent per pipeline phase in this process, summed over entities (read by benchmark_pipeline.py)
+phase_timings = defaultdict(float)
+
+@contextmanager
+def timed_phase(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        phase_timings[name] += time.perf_counter() - started
+
+def process_stream(process, records, *args, empty=Table):
+    """Run a DataProcessor method over a streamed fetch. If the stream fails midway the result is dropped
+    (like a failed fetch_* call) and empty() is returned instead of a table from partial data."""
+    try:
+        return process(records, *args)
+    except APIError as e:
+        logging.error(f"Error while streaming data for {process.__name__}: {e}")
+        return empty()
+
+def use_bulk_fetch(bulk, fetch_count, total_entities):
+    """Whether to fetch the run's data in bulk (see BULK_MIN_FRACTION). With bulk = auto and an unknown
+    number of entities (a manifest from an older run) the per-entity fetches are used"""
+    if bulk == 'on':
+        return True
+    if bulk == 'off' or not total_entities:
+        return False
+    return fetch_count > 1 and fetch_count >= BULK_MIN_FRACTION * total_entities
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate customer status reports")
+    parser.add_argument("--entities", nargs='+', help='Entities to report on without the interactive menu: names, IDs, glob patterns or "all"')
+    parser.add_argument("--config", help="INI file with paths, slide numbers and run settings (see report_config.example.ini)")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the persistent API response cache")
+    parser.add_argument("--refresh", action="store_true", help="Ignore cached API responses and refetch (the cache is updated)")
+    parser.add_argument("--cache-path", default=CACHE_PATH, help="Location of the API response cache file")
+    parser.add_argument("--workers", type=int, help="Number of entities to render in parallel worker processes (overrides the config)")
+    parser.add_argument("--entity-deadline", type=float, help="Maximum seconds per entity report, 0 for no limit (overrides the config)")
+    parser.add_argument("--bulk", choices=['auto', 'on', 'off'], help="Fetch all entities' data at once: on, off, or auto for large selections (overrides the config)")
+    parser.add_argument("--order", choices=['size', 'name'], help="Queue the largest customers first or go alphabetically (overrides the config)")
+    parser.add_argument("--resume", action="store_true", help="Continue the last run from its manifest, skipping finished entities and stages")
+    parser.add_argument("--manifest", nargs='?', const=MANIFEST_PATH, help=f"Checkpoint this run to a manifest file so it can be resumed (default: {MANIFEST_PATH})")
+    parser.add_argument("--record-snapshot", action="store_true", help=f"Save every raw API response to a new directory under {SNAPSHOT_DIRECTORY}")
+    parser.add_argument("--replay-snapshot", metavar="DIR", help="Serve all API calls from a recorded snapshot directory (no network)")
+    parser.add_argument("--snapshot-compression", choices=['gzip', 'lzma'], default='gzip', help="Compression of recorded payloads")
+    parser.add_argument("--no-history", action="store_true", help="Fetch the log volume range directly instead of through the local history")
+    parser.add_argument("--history-path", default=LOG_VOLUME_HISTORY_PATH, help="Location of the log volume history file")
+    parser.add_argument("--history-days", type=int, default=14,
+                        help=f"Days of log volume history to keep complete: the default covers last week and the week before "
+                             f"for the MPS overview, {TREND_WEEKS * 7} backfills the trend")
+    parser.add_argument("--telemetry-dir", default=TELEMETRY_DIRECTORY, help="Where to write the API telemetry summary (empty to disable)")
+    return parser.parse_args(argv)
+
+#######################################################################################################################################################################
+def generate_entity_report(api_handler, entity_info, entity_data, config=None, manifest=None):
+    """Fetch, process, export and render the report of one entity. entity_data holds the entity's
+    slice of the run-wide datasets (at least 'pending_log_sources'); anything missing is fetched here.
+    With a RunManifest every completed stage is checkpointed and stages it already records are skipped."""
+    config = config or ReportConfig()
+    entity = entity_info['Entity Name']
+    entity_id = entity_info['Entity ID']
+
+    # Set relevant variables
+    csv_ext = ".csv"
+    #entity = ""
+    #entityId = 0
+    ppt_name = config.ppt_name
+    replacements = {
+        "<Kunden>": entity,
+        "<Dato>": datetime.now().strftime("%d/%m/%Y")
+    }
+
+    # Set relevant paths
+    # Set the base directory and entity name
+    base_directory = config.output_directory
+
+    # Create the entity-specific directory
+    entity_directory = os.path.join(base_directory, entity)
+    ensure_directory_exists(entity_directory)
+
+    template_path = config.template_path
+
+    # Set slide numbers for PowerPoint
+    slide_number1 = config.slides['log_source_overview']  # Log Source Overview
+    slide_number2 = config.slides['log_volume']  # MPS/Log Volume
+    slide_number3 = config.slides['missing_logs']  # Missing Logs/SLS Alarms
+    slide_number4 = config.slides['pending_log_sources']  # Pending Logs
+
+    # Set filenames and filepaths
+    filename1 = f"{entity}_log_source_overview{csv_ext}"
+    csv_path1 = os.path.join(entity_directory, filename1)
+
+    filename2 = f"{entity}_log_volume{csv_ext}"
+    csv_path2 = os.path.join(entity_directory, filename2)
+
+    filename3 = f"{entity}_missing_logs{csv_ext}"
+    csv_path3 = os.path.join(entity_directory, filename3)
+
+    filename4 = f"{entity}_pending_log_sources{csv_ext}"
+    csv_path4 = os.path.join(entity_directory, filename4)
+
+    filename5 = f"{entity}_log_volume_trend{csv_ext}"
+    csv_path5 = os.path.join(entity_directory, filename5)
+
+#######################################################################################################################################################################
+#######################################################################################################################################################################
+
+    # Stages this entity already completed in an earlier, interrupted run (see RunManifest)
+    stages = manifest.stages(entity) if manifest is not None else {}
+
+    if 'processed' in stages:
+        logging.info(f"Resuming {entity} from its processed tables")
+        (processed_log_source_overview, processed_log_volume, processed_missing_logs,
+         processed_pending_log_sources, processed_log_volume_trend) = manifest.load_payload(entity, 'processed')
+    else:
+        # API calls for fetching data (bulk-fetched or checkpointed datasets come in through entity_data)
+        with timed_phase('report_fetch'):
+            if 'log_source_overview' in entity_data:
+                log_source_overview = entity_data['log_source_overview']
+                missing_logs = entity_data['alarm_details']
+            elif manifest is not None:
+                # Checkpointing needs the raw records, so fetch complete lists instead of streaming
+                log_source_overview = api_handler.fetch_entity_log_source_overview(entity_id)
+                missing_logs = api_handler.fetch_alarm_details(DataProcessor.extract_alarm_ids(api_handler.fetch_alarms(entity)))
+            else:
+                # Log sources and alarms are streamed page by page and aggregated as they arrive
+                log_source_overview = api_handler.iter_entity_log_source_overview(entity_id)
+                alarm_ids = process_stream(DataProcessor.extract_alarm_ids, api_handler.iter_alarms(entity), empty=list)
+                missing_logs = api_handler.fetch_alarm_details(alarm_ids)
+            pending_log_sources = entity_data['pending_log_sources']
+            log_volume = entity_data.get('log_volume')
+            if log_volume is None:
+                log_volume = api_handler.fetch_entity_log_volume(entity_id)
+
+        # Do not render a report from data that was cut short by the deadline
+        api_handler.check_deadline()
+
+        # Only checkpoint complete data, so a resumed run refetches whatever failed
+        if manifest is not None and 'fetched' not in stages and None not in (log_source_overview, pending_log_sources, log_volume):
+            manifest.save_payload(entity, 'raw', {
+                'log_source_overview': log_source_overview,
+                'alarm_details': missing_logs,
+                'pending_log_sources': pending_log_sources,
+                'log_volume': log_volume,
+                'log_volume_trend': entity_data.get('log_volume_trend')
+            })
+            manifest.mark(entity, 'fetched')
+
+#######################################################################################################################################################################
+#######################################################################################################################################################################
+
+        # Process data from API calls (a streamed log source fetch is consumed here)
+        with timed_phase('report_process'):
+            processed_log_source_overview = process_stream(DataProcessor.process_log_source_overview, log_source_overview, entity)
+            processed_log_volume = DataProcessor.process_log_volume(log_volume)
+            processed_missing_logs = DataProcessor.extract_alarm_details(missing_logs, entity)
+            processed_pending_log_sources = DataProcessor.process_pending_log_sources(pending_log_sources, entity)
+            processed_log_volume_trend = DataProcessor.process_log_volume_trend(entity_data.get('log_volume_trend'))
+
+        # A streamed log source fetch is only read while processing, so a deadline that ran out during it
+        # (and left an empty table behind) must fail the report here
+        api_handler.check_deadline()
+
+        if manifest is not None and 'fetched' in manifest.stages(entity):
+            manifest.save_payload(entity, 'processed', (processed_log_source_overview, processed_log_volume, processed_missing_logs,
+                                                        processed_pending_log_sources, processed_log_volume_trend))
+            manifest.mark(entity, 'processed')
+
+#######################################################################################################################################################################
+#######################################################################################################################################################################
+
+    # Write processed data from API calls to csv files in the background (optional side output)
+    csv_exports = []
+    if WRITE_CSV and 'csv_written' not in stages:
+        csv_exports = [
+            DataProcessor.write_to_csv_async(processed_log_source_overview, csv_path1),
+            DataProcessor.write_to_csv_async(processed_log_volume, csv_path2),
+            DataProcessor.write_to_csv_async(processed_missing_logs, csv_path3),
+            DataProcessor.write_to_csv_async(processed_pending_log_sources, csv_path4)
+        ]
+        # The trend only exists once the log volume history holds some days
+        if processed_log_volume_trend:
+            csv_exports.append(DataProcessor.write_to_csv_async(processed_log_volume_trend, csv_path5))
+
+#######################################################################################################################################################################
+#######################################################################################################################################################################
+
+
+    if 'rendered' in stages and os.path.exists(stages['rendered']):
+        ppt_path = stages['rendered']
+        logging.info(f"Deck for {entity} already rendered: {ppt_path}")
+    else:
+        # Load the PowerPoint template (read and parsed once per process)
+        with timed_phase('report_render'):
+            template = PowerPointProcess.load_template(template_path, replacements.keys())
+
+        # Set arguments for adding data into PowerPoint (tables are rendered straight from memory)
+        table_details = [
+            (slide_number1, processed_log_source_overview, 0.5, 1.6),
+            (slide_number2, processed_log_volume, 1.2, 1.2),
+            (slide_number3, processed_missing_logs, 0.5, 1.2),
+            (slide_number4, processed_pending_log_sources, 1.2, 1.2)
+            # Add more as needed
+        ]
+        # Copy the template in memory, replace placeholder text, add all tables and save once
+        with timed_phase('report_render'):
+            ppt_path = PowerPointProcess.build_deck_from_template(template, entity_directory, entity, ppt_name, replacements, table_details)
+        if manifest is not None:
+            manifest.mark(entity, 'rendered', ppt_path)
+
+    # Make sure the CSV side output is on disk before the report counts as done
+    with timed_phase('report_csv_wait'):
+        DataProcessor.wait_for_csv_exports(csv_exports)
+    if manifest is not None and csv_exports:
+        manifest.mark(entity, 'csv_written')
+
+    return ppt_path
+
+#######################################################################################################################################################################
+#######################################################################################################################################################################
+
+# Process pool workers - every worker process builds its own APIHandler (and run manifest connection) once
+_worker_api_handler = None
+_worker_manifest = None
+
+def init_report_worker(cache_path, refresh, manifest_path=None, snapshot=None, rate_limit=None, base_urls=None):
+    global _worker_api_handler, _worker_manifest
+    _worker_api_handler = APIHandler()
+    # Base URLs of the parent's handler, so a handler configured at runtime (e.g. against the mock server) also
+    # applies to workers started with spawn, which re-import this module instead of inheriting its state
+    if base_urls:
+        _worker_api_handler.BASE_ADMIN_URL, _worker_api_handler.BASE_METRICS_URL, _worker_api_handler.BASE_ALARM_URL = base_urls
+    # This worker's slice of the run's rate limit, (rate, capacity) or None for no limit
+    _worker_api_handler.rate_limiter = TokenBucket(*rate_limit) if rate_limit else None
+    if cache_path:
+        _worker_api_handler.enable_response_cache(cache_path, refresh=refresh)
+    if snapshot:
+        _worker_api_handler.enable_snapshots(*snapshot)
+    if manifest_path:
+        _worker_manifest = RunManifest(manifest_path)
+
+def run_entity_report(api_handler, entity_info, entity_data, entity_deadline=None, config=None, manifest=None):
+    """Generate one report and return (entity name, error or None, API telemetry of the entity)
+    so one failure does not stop the run"""
+    entity = entity_info['Entity Name']
+    if api_handler is None:
+        api_handler = _worker_api_handler
+        manifest = _worker_manifest
+    error = None
+    try:
+        with api_handler.telemetry.entity_scope(entity), api_handler.deadline(entity_deadline):
+            generate_entity_report(api_handler, entity_info, entity_data, config, manifest)
+    except Exception as e:
+        logging.exception(f"Report for {entity} failed")
+        error = f"{type(e).__name__}: {e}"
+    return entity, error, api_handler.telemetry.snapshot(entity)
+
+def run_reports(api_handler, selected_entities, entity_data_by_name, workers=1, cache_path=None, refresh=False, entity_deadline=None, config=None,
+                manifest=None):
+    """Generate the reports of all selected entities, in a process pool when workers > 1.
+    Entities are queued in the order given; the pool hands them to workers first in, first out."""
+    results = []
+    if workers <= 1 or len(selected_entities) <= 1:
+        for entity_info in selected_entities:
+            entity, error, _ = run_entity_report(api_handler, entity_info, entity_data_by_name[entity_info['Entity Name']], entity_deadline, config,
+                                                 manifest)
+            results.append((entity, error))
+    else:
+        print(f"Generating {len(selected_entities)} reports with {workers} worker processes")
+        manifest_path = manifest.path if manifest is not None else None
+        store = api_handler.snapshot_store
+        snapshot = (store.directory, store.mode, store.compression) if store is not None else None
+        # Every worker has its own handler, so split the rate limit evenly to keep the pool as a whole under it
+        limiter = api_handler.rate_limiter
+        processes = min(workers, len(selected_entities))
+        rate_limit = (limiter.rate / processes, max(1.0, limiter.capacity / processes)) if limiter is not None else None
+        base_urls = (api_handler.BASE_ADMIN_URL, api_handler.BASE_METRICS_URL, api_handler.BASE_ALARM_URL)
+        with ProcessPoolExecutor(max_workers=processes, initializer=init_report_worker,
+                                 initargs=(cache_path, refresh, manifest_path, snapshot, rate_limit, base_urls)) as executor:
+            futures = [executor.submit(run_entity_report, None, entity_info, entity_data_by_name[entity_info['Entity Name']], entity_deadline, config)
+                       for entity_info in selected_entities]
+            for future in as_completed(futures):
+                entity, error, telemetry = future.result()
+                # Worker processes have their own handler, so bring their counters back into the run totals
+                api_handler.telemetry.merge(telemetry)
+                results.append((entity, error))
+
+    print_run_summary(results)
+    return results
+
+def print_run_summary(results):
+    failures = [(entity, error) for entity, error in results if error]
+    print(f"\nReports generated: {len(results) - len(failures)} succeeded, {len(failures)} failed")
+    for entity, error in sorted(failures):
+        print(f"  FAILED {entity}: {error}")
+
+def write_telemetry(api_handler, directory):
+    """Write the run's API telemetry as api_telemetry_<timestamp>.json plus automate_reports.prom"""
+    ensure_directory_exists(directory)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    api_handler.telemetry.write_json(os.path.join(directory, f"api_telemetry_{timestamp}.json"))
+    api_handler.telemetry.write_prometheus(os.path.join(directory, "automate_reports.prom"))
+
+def mps_overview_path(output_directory, selected_count, total_entities):
+    if total_entities and selected_count >= total_entities:
+        return os.path.join(output_directory, MPS_OVERVIEW_NAME)
+    name, extension = os.path.splitext(MPS_OVERVIEW_NAME)
+    return os.path.join(output_directory, f"{name}_{selected_count}_entities_{datetime.now().strftime('%Y%m%d_%H%M%S')}{extension}")
+
+def write_mps_overview(selected_entities, entity_data_by_name, history, path):
+    """Build the portfolio MPS overview with LogVolumeEngine from the log volume already fetched for the reports
+    (and the week before from the history) and write it as a formatted workbook"""
+    today = date.today()
+    week = (today - timedelta(days=7)).isoformat()
+    previous_week = (today - timedelta(days=14)).isoformat()
+
+    responses = {}
+    for entity_info in selected_entities:
+        entity_data = entity_data_by_name.get(entity_info['Entity Name']) or {}
+        by_period = {week: entity_data.get('log_volume')}
+        if history is not None:
+            by_period[previous_week] = history.log_volume_response(entity_info['Entity ID'], today - timedelta(days=14), today - timedelta(days=7))
+        responses[entity_info['Entity Name']] = by_period
+
+    periods = [previous_week, week] if history is not None else [week]
+    engine = LogVolumeEngine.from_responses(responses, periods=periods)
+    ExcelOperations.table_to_excel(engine.mps_overview_table(), path, format_mps_overview=True)
+    logging.info(f"MPS overview of {len(responses)} entities written to {path}")
+
+#######################################################################################################################################################################
+#######################################################################################################################################################################
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = ReportConfig.load(args.config) if args.config else ReportConfig()
+
+    # Create instances of classes
+    api_handler = APIHandler()
+    if not args.no_cache:
+        api_handler.enable_response_cache(args.cache_path, refresh=args.refresh)
+    if args.replay_snapshot:
+        api_handler.enable_snapshots(args.replay_snapshot, 'replay')
+    elif args.record_snapshot:
+        snapshot_directory = os.path.join(SNAPSHOT_DIRECTORY, datetime.now().strftime("%Y%m%d_%H%M%S"))
+        api_handler.enable_snapshots(snapshot_directory, 'record', args.snapshot_compression)
+        print(f"Recording API responses to {snapshot_directory}")
+    data_processor = DataProcessor()
+    powerpoint_processor = PowerPointProcess()
+
+    # Checkpoints of this run (only with --manifest or --resume); --resume picks up the entities and stages of the previous one
+    manifest_path = args.manifest or (MANIFEST_PATH if args.resume else None)
+    manifest = RunManifest(manifest_path) if manifest_path else None
+    resumed_entities = manifest.selected_entities() if args.resume else None
+    if args.resume and resumed_entities is None:
+        print(f"Nothing to resume in {manifest.path}, starting a new run")
+
+    entity_patterns = args.entities or config.entities
+    if resumed_entities and not args.entities:
+        selected_entities = resumed_entities
+        total_entities = manifest.run_value('total_entities')
+        print(f"Resuming the run of {len(selected_entities)} entities recorded in {manifest.path}")
+    else:
+        # Fetch entities from API
+        with timed_phase('fetch_entities'):
+            entities = api_handler.fetch_entities()
+
+        # Process entities and select them from the command line / config, or from the menu when neither names any
+        processed_entities = data_processor.process_entities(entities)
+        if entity_patterns:
+            selected_entities = select_entities(processed_entities, entity_patterns)
+            print(f"Selected {len(selected_entities)} of {len(processed_entities)} entities")
+        else:
+            selected_entities = display_entities_and_select(processed_entities)
+        total_entities = len(processed_entities)
+
+    # Every entity of the run, including the ones a resumed run already finished (for the MPS overview)
+    run_entities = selected_entities
+    if manifest is not None:
+        if resumed_entities is None:
+            manifest.reset(selected_entities, total_entities)
+
+        # Entities whose report is complete are done; checkpointed raw data replaces the fetch for the rest
+        required_stages = [stage for stage in RunManifest.STAGES if WRITE_CSV or stage != 'csv_written']
+        finished = [entity_info for entity_info in selected_entities if manifest.is_complete(entity_info['Entity Name'], required_stages)]
+        if finished:
+            print(f"Skipping {len(finished)} entities finished in the previous run")
+        selected_entities = [entity_info for entity_info in selected_entities if entity_info not in finished]
+
+    entity_data_by_name = {}
+    to_fetch = []
+    for entity_info in selected_entities:
+        entity = entity_info['Entity Name']
+        if manifest is not None and 'fetched' in manifest.stages(entity):
+            entity_data_by_name[entity] = manifest.load_payload(entity, 'raw')
+        else:
+            to_fetch.append(entity_info)
+
+    # Fetch everything once and index it by entity, or only what the per-entity fetches cannot filter
+    bulk_data = None
+    pending_index = None
+    if to_fetch:
+        bulk = use_bulk_fetch(args.bulk or config.bulk, len(to_fetch), total_entities)
+        print(f"Fetching data for {len(to_fetch)} entities {'in bulk' if bulk else 'per entity'}")
+        with timed_phase('bulk_fetch'):
+            if bulk:
+                bulk_data = BulkDataset.fetch(api_handler, [entity_info['Entity Name'] for entity_info in to_fetch])
+            else:
+                # The pending queue is not entity-specific, so fetch and index it once for all entities
+                pending_index = BulkDataset.index_pending_log_sources(api_handler.fetch_entity_pending_log_sources())
+
+    # Hand every entity its slice of the run-wide data
+    for entity_info in to_fetch:
+        entity = entity_info['Entity Name']
+        if bulk_data:
+            entity_data_by_name[entity] = bulk_data.for_entity(entity_info['Entity ID'], entity)
+        else:
+            entity_data_by_name[entity] = {'pending_log_sources': pending_index.get(entity_name=entity)}
+
+    # Log volume: complete the local history with the days it is missing and read the last week and the trend
+    # from it, or (--no-history) one request per batch of entities for the last week.
+    # Snapshots store dates relative to the day they were recorded, so a replay on a later day would file the
+    # recorded counts under the wrong days; recording and replaying both skip the history and replay the plain weekly request
+    use_history = not (args.no_history or args.replay_snapshot or args.record_snapshot)
+    if not args.no_history and not use_history:
+        print("Log volume history is not used while recording or replaying a snapshot")
+    history = LogVolumeStore(args.history_path) if use_history else None
+    if to_fetch:
+        entity_ids = [entity_info['Entity ID'] for entity_info in to_fetch]
+        with timed_phase('log_volume_fetch'):
+            if history is not None:
+                history.update(api_handler, entity_ids, days=args.history_days)
+            else:
+                log_volumes = api_handler.fetch_log_volume_for_entities(entity_ids)
+        today = date.today()
+        for entity_info in to_fetch:
+            entity_id = entity_info['Entity ID']
+            entity_data = entity_data_by_name[entity_info['Entity Name']]
+            if history is not None:
+                # None while days of the week are missing, the report then fetches the week directly
+                entity_data['log_volume'] = history.log_volume_response(entity_id, today - timedelta(days=7), today)
+                entity_data['log_volume_trend'] = history.weekly_totals(entity_id, TREND_WEEKS, today)
+            else:
+                entity_data['log_volume'] = log_volumes.get(entity_id)
+
+    if WRITE_MPS_OVERVIEW and run_entities:
+        with timed_phase('mps_overview'):
+            # Entities finished in the previous run contribute the log volume checkpointed with their raw data
+            overview_data = dict(entity_data_by_name)
+            for entity_info in run_entities:
+                if entity_info['Entity Name'] not in overview_data:
+                    overview_data[entity_info['Entity Name']] = manifest.load_payload(entity_info['Entity Name'], 'raw') or {}
+            ensure_directory_exists(config.output_directory)
+            write_mps_overview(run_entities, overview_data, history,
+                               mps_overview_path(config.output_directory, len(run_entities), total_entities))
+
+    # Queue the largest customers first so the longest reports do not end up last on the critical path
+    selected_entities = order_entities(selected_entities, entity_data_by_name, args.order or config.order)
+
+    # Generate the reports, spread over a process pool when workers > 1
+    cache_path = None if args.no_cache else args.cache_path
+    workers = args.workers if args.workers is not None else config.workers
+    entity_deadline = (args.entity_deadline if args.entity_deadline is not None else config.entity_deadline) or None
+    with timed_phase('reports'):
+        results = run_reports(api_handler, selected_entities, entity_data_by_name, workers, cache_path, args.refresh, entity_deadline, config,
+                              manifest)
+
+    # Per entity and endpoint API counters for this run
+    if args.telemetry_dir:
+        write_telemetry(api_handler, args.telemetry_dir)
+
+    # Release pooled API connections
+    api_handler.close()
+    if manifest is not None:
+        manifest.close()
+    if history is not None:
+        history.close()
+    return results
+
+
+#######################################################################################################################################################################
+#######################################################################################################################################################################
+
+if __name__ == "__main__":
+    # Non-zero exit status when any report failed, for cron and scheduled tasks
+    results = main()
+    sys.exit(1 if any(error for _, error in results) else 0)
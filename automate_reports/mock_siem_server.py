@@ -0,0 +1,296 @@
+import argparse
+import bisect
+import json
+import logging
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Named scales for the benchmarks: entities, log sources, silent log source alarms, pending log sources
+SCALES = {
+    'small': {'entities': 10, 'log_sources': 10000, 'alarms': 200, 'pending': 100},
+    'medium': {'entities': 100, 'log_sources': 100000, 'alarms': 2000, 'pending': 1000},
+    'large': {'entities': 1000, 'log_sources': 1000000, 'alarms': 20000, 'pending': 10000}
+}
+
+LOG_SOURCE_TYPES = (
+    ['MS Windows Event Logging - Security', 'MS Windows Event Logging - System', 'Syslog - Linux Host',
+     'Syslog - Cisco ASA', 'Syslog - Palo Alto Firewall', 'Syslog - Fortinet FortiGate', 'Flat File - Apache Access Log',
+     'Flat File - IIS W3C', 'API - Office 365 Management Activity', 'API - Azure Event Hub', 'API - AWS CloudTrail',
+     'Syslog - VMware ESXi', 'Syslog - Check Point', 'MS Windows Event Logging - Sysmon', 'Syslog - F5 BIG-IP']
+    + [f'Syslog - Generic Device {index:02d}' for index in range(1, 46)]
+    + ['LogRhythm System Monitor', 'LogRhythm Echo', 'LogRhythm Network Monitor']
+)
+
+
+class SyntheticDataset:
+    """Deterministic fake SIEM data that is computed per record instead of stored, so a million log
+    sources cost no memory on the server side. Entity sizes follow a Zipf-like distribution (a few
+    large customers, many small ones); every entity owns a contiguous range of log source and alarm IDs."""
+
+    def __init__(self, entities=10, log_sources=10000, alarms=200, pending=100, seed=42):
+        self.entity_count = entities
+        self.log_source_count = log_sources
+        self.alarm_count = alarms
+        self.pending_count = pending
+        self.seed = seed
+
+        self.entity_names = [f'Customer {index:04d}' for index in range(entities)]
+        self.entity_ids = [1000 + index for index in range(entities)]
+        self.entity_index = {entity_id: index for index, entity_id in enumerate(self.entity_ids)}
+        self.entity_name_index = {name: index for index, name in enumerate(self.entity_names)}
+
+        weights = [1.0 / (index + 1) ** 0.8 for index in range(entities)]
+        self.log_source_starts = self.split(log_sources, weights)
+        self.alarm_starts = self.split(alarms, weights)
+
+    @staticmethod
+    def split(total, weights):
+        """Start offsets (plus the end) of consecutive ranges whose sizes follow weights and add up to total"""
+        weight_sum = sum(weights)
+        starts = [0]
+        for weight in weights[:-1]:
+            starts.append(min(total, starts[-1] + int(round(total * weight / weight_sum))))
+        starts.append(total)
+        return starts
+
+    def owner(self, starts, record_id):
+        return bisect.bisect_right(starts, record_id) - 1
+
+    #######################################################################################################################################################################
+    #######################################################################################################################################################################
+
+    def entity(self, index):
+        return {'id': self.entity_ids[index], 'name': self.entity_names[index], 'recordStatusName': 'Active'}
+
+    def log_source(self, record_id):
+        index = self.owner(self.log_source_starts, record_id)
+        type_id = (record_id * 7919 + self.seed) % len(LOG_SOURCE_TYPES)
+        return {
+            'id': record_id,
+            'name': f'LS-{record_id:07d}',
+            'entity': {'id': self.entity_ids[index], 'name': self.entity_names[index]},
+            'logSourceType': {'id': type_id, 'name': LOG_SOURCE_TYPES[type_id]},
+            'host': {'id': record_id // 3, 'name': f'host-{record_id // 3:07d}'},
+            'recordStatusName': 'Active'
+        }
+
+    def pending_log_source(self, record_id):
+        index = record_id % self.entity_count
+        return {
+            'id': record_id,
+            'name': f'Pending-{record_id:06d}',
+            'ip': f'10.{record_id // 65536 % 256}.{record_id // 256 % 256}.{record_id % 256}',
+            'collectionHost': f'Entity: {self.entity_names[index]}, Host: collector-{index:04d}',
+            'logSourceAcceptanceStatus': 'Pending'
+        }
+
+    def alarm(self, alarm_id):
+        index = self.owner(self.alarm_starts, alarm_id)
+        return {
+            'alarmId': alarm_id,
+            'alarmRuleName': 'DBX: LogRhythm Silent Log Source Error',
+            'entityName': self.entity_names[index],
+            'alarmStatus': 'New'
+        }
+
+    def alarm_events(self, alarm_id):
+        index = self.owner(self.alarm_starts, alarm_id)
+        log_source_id = self.log_source_starts[index] + alarm_id % max(1, self.log_source_starts[index + 1] - self.log_source_starts[index])
+        return {
+            'alarmEventsDetails': [{
+                'entityName': self.entity_names[index],
+                'logSourceName': f'LS-{log_source_id:07d}',
+                'logSourceHostName': f'host-{log_source_id // 3:07d}',
+                'logDate': f'2024-01-{alarm_id % 28 + 1:02d}T{alarm_id % 24:02d}:00:00Z'
+            }]
+        }
+
+    def log_volume(self, entity_id):
+        """One grouped log volume item per entity, with a logsCount per log source type it owns"""
+        index = self.entity_index[entity_id]
+        size = self.log_source_starts[index + 1] - self.log_source_starts[index]
+        rng = random.Random(self.seed * 100003 + index)
+        types = LOG_SOURCE_TYPES[:max(1, min(len(LOG_SOURCE_TYPES), size))]
+        info = [{'logSourceType': name, 'logsCount': rng.randint(1000, 50000) * max(1, size // len(types))} for name in types]
+        return {'groupById': entity_id, 'logSourceTypeInfo': info, 'totalLogs': sum(item['logsCount'] for item in info)}
+
+    #######################################################################################################################################################################
+    #######################################################################################################################################################################
+
+    # Record ID ranges matching the filters the fetchers send
+
+    def log_source_ids(self, entity_id=None):
+        if entity_id is None:
+            return range(self.log_source_count)
+        index = self.entity_index.get(entity_id)
+        if index is None:
+            return range(0)
+        return range(self.log_source_starts[index], self.log_source_starts[index + 1])
+
+    def alarm_ids(self, entity_name=None):
+        if entity_name is None:
+            return range(self.alarm_count)
+        index = self.entity_name_index.get(entity_name)
+        if index is None:
+            return range(0)
+        return range(self.alarm_starts[index], self.alarm_starts[index + 1])
+
+
+class MockSIEMRequestHandler(BaseHTTPRequestHandler):
+    """Serves the admin, metrics and alarm endpoints used by APIHandler with count/offset pagination"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        self.respond(url.path.strip('/'), query)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length) or b'{}')
+        self.respond(urlsplit(self.path).path.strip('/'), body)
+
+    def respond(self, path, params):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        server.count_request(path)
+
+        payload = self.route(server.dataset, path, params)
+        if payload is None:
+            self.send_json(404, {'error': f'Unknown endpoint {path}'})
+        else:
+            self.send_json(200, payload)
+
+    @staticmethod
+    def page(ids, params):
+        count = int(params.get('count', 1000))
+        offset = int(params.get('offset', 0))
+        return ids[offset:offset + count]
+
+    def route(self, dataset, path, params):
+        if path == 'entities':
+            return [dataset.entity(index) for index in self.page(range(dataset.entity_count), params)]
+
+        if path == 'logsources':
+            entity_id = int(params['entityId']) if params.get('entityId') else None
+            return [dataset.log_source(record_id) for record_id in self.page(dataset.log_source_ids(entity_id), params)]
+
+        if path == 'logsources-request':
+            return [dataset.pending_log_source(record_id) for record_id in self.page(range(dataset.pending_count), params)]
+
+        if path == 'logvolume':
+            ids = [entity_id for entity_id in (params.get('groupBy') or {}).get('Ids', []) if entity_id in dataset.entity_index]
+            return {'data': [dataset.log_volume(entity_id) for entity_id in self.page(ids, params)]}
+
+        if path == 'alarms':
+            alarm_ids = self.page(dataset.alarm_ids(params.get('entityName')), params)
+            return {'alarmsSearchDetails': [dataset.alarm(alarm_id) for alarm_id in alarm_ids]}
+
+        match = re.fullmatch(r'alarms/(\d+)/events', path)
+        if match and int(match.group(1)) < dataset.alarm_count:
+            return dataset.alarm_events(int(match.group(1)))
+
+        return None
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class MockSIEMServer(ThreadingHTTPServer):
+    """Local stand-in for the SIEM API. Start it with start(), point an APIHandler at it with
+    configure(api_handler) and stop it with stop(). latency adds a fixed delay (seconds) per request."""
+
+    daemon_threads = True
+
+    def __init__(self, dataset, host='127.0.0.1', port=0, latency=0.0):
+        super().__init__((host, port), MockSIEMRequestHandler)
+        self.dataset = dataset
+        self.latency = latency
+        self.request_counts = {}
+        self._counts_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f'http://{self.server_address[0]}:{self.server_address[1]}'
+
+    def count_request(self, path):
+        endpoint = re.sub(r'\d+', '{id}', path)
+        with self._counts_lock:
+            self.request_counts[endpoint] = self.request_counts.get(endpoint, 0) + 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name='mock-siem', daemon=True)
+        self._thread.start()
+        logging.info(f"Mock SIEM API listening on {self.base_url}")
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def configure(self, api_handler):
+        """Point all three base URLs of an APIHandler at this server"""
+        api_handler.BASE_ADMIN_URL = self.base_url
+        api_handler.BASE_METRICS_URL = self.base_url
+        api_handler.BASE_ALARM_URL = self.base_url
+        return api_handler
+
+
+def add_scale_arguments(parser):
+    """Scale options shared by the mock server and the pipeline benchmark"""
+    parser.add_argument("--scale", choices=sorted(SCALES), default='small', help="Preset data size")
+    parser.add_argument("--entities", type=int, help="Number of entities (overrides the preset)")
+    parser.add_argument("--log-sources", type=int, help="Number of log sources over all entities (overrides the preset)")
+    parser.add_argument("--alarms", type=int, help="Number of silent log source alarms (overrides the preset)")
+    parser.add_argument("--pending", type=int, help="Number of pending log sources (overrides the preset)")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the synthetic data")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds the server waits before every response")
+
+def scale_from_args(args):
+    scale = dict(SCALES[args.scale])
+    for key in ('entities', 'log_sources', 'alarms', 'pending'):
+        if getattr(args, key) is not None:
+            scale[key] = getattr(args, key)
+    return scale
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve synthetic SIEM data for benchmarks and manual testing")
+    add_scale_arguments(parser)
+    parser.add_argument("--port", type=int, default=8085, help="Port to listen on")
+    args = parser.parse_args(argv)
+
+    dataset = SyntheticDataset(seed=args.seed, **scale_from_args(args))
+    server = MockSIEMServer(dataset, port=args.port, latency=args.latency)
+    logging.info(f"Serving {dataset.entity_count} entities, {dataset.log_source_count} log sources, "
+                 f"{dataset.alarm_count} alarms and {dataset.pending_count} pending log sources on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,120 +1,231 @@
-import os
-import shutil
-from pptx import Presentation
-from pptx.util import Inches, Pt
-from pptx.enum.text import PP_ALIGN
-from pptx.dml.color import RGBColor
-import csv
-import logging
-
-# Initialize logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-
-class PowerPointProcess:
-
-    @staticmethod
-    def copy_and_rename_ppt(template_path, destination_path, entity_name, ppt_name):
-        try:
-            if not os.path.exists(template_path):
-                raise FileNotFoundError(f"PowerPoint template not found at {template_path}")
-
-            new_file_name = f"{entity_name}_{ppt_name}.pptx"
-            new_file_path = os.path.join(destination_path, new_file_name)
-            shutil.copy(template_path, new_file_path)
-
-            logging.info(f"Template successfully copied and renamed to {new_file_path}")
-            return new_file_path
-
-        except FileNotFoundError as e:
-            logging.error(f"Error: {e}")
-        except Exception as e:
-            logging.error(f"An unexpected error occurred: {e}")
-
-    @staticmethod
-    def replace_text_in_shape(shape, old_text, new_text):
-        if not shape.has_text_frame:
-            return
-        for paragraph in shape.text_frame.paragraphs:
-            for run in paragraph.runs:
-                if old_text in run.text:
-                    run.text = run.text.replace(old_text, new_text)
-
-    @staticmethod
-    def replace_text_in_ppt(ppt_path, replacements):
-        try:
-            prs = Presentation(ppt_path)
-            for slide in prs.slides:
-                for shape in slide.shapes:
-                    for old_text, new_text in replacements.items():
-                        PowerPointProcess.replace_text_in_shape(shape, old_text, new_text)
-            prs.save(ppt_path)
-            logging.info(f"Text replaced in presentation: {ppt_path}")
-
-        except Exception as e:
-            logging.error(f"An error occurred: {e}")
-
-    @staticmethod
-    def add_and_format_table_in_powerpoint(ppt_path, slide_number, csv_path, left, top):
-        prs = Presentation(ppt_path)
-
-        with open(csv_path, newline='') as csvfile:
-            reader = csv.reader(csvfile)
-            data = list(reader)
-
-        rows, cols = len(data), len(data[0])
-        slide = prs.slides[slide_number - 1]
-
-        # Dynamically adjust font size based on the number of rows
-        font_size = Pt(9) if rows <= 10 else Pt(8) if rows <= 15 else Pt(7)
-
-        # Calculate maximum width required for each column
-        first_col_multiplier = 0.25
-        default_col_multiplier = 0.0  # Adjusted multiplier
-        col_max_widths = [
-            Inches(first_col_multiplier * max(len(row[0]) for row in data) if i == 0 else
-                default_col_multiplier * max(len(row[i]) for row in data))
-            for i in range(cols)
-        ]
-        total_table_width = sum(col_max_widths)
-
-        table = slide.shapes.add_table(rows, cols, Inches(left), Inches(top), total_table_width, Inches(3)).table
-
-        for i, row in enumerate(data):
-            for j, cell_text in enumerate(row):
-                cell = table.cell(i, j)
-                cell.width = col_max_widths[j]
-
-                # Set cell to have no fill (transparent)
-                cell.fill.background()
-
-                para = cell.text_frame.paragraphs[0]
-                run = para.add_run()
-                run.text = cell_text
-                run.font.size = font_size
-
-                # Align the first column left, and others right
-                para.alignment = PP_ALIGN.LEFT if j == 0 else PP_ALIGN.RIGHT
-
-                # Make headers and "Total" cell bold and black
-                if i == 0 or (i == rows - 1 and j == 0):
-                    run.font.bold = True
-                    run.font.color.rgb = RGBColor(0, 0, 0)  # Black color
-
-        prs.save(ppt_path)
-        logging.info(f"Table added to slide {slide_number} in PowerPoint file {ppt_path}")
-
-
-    @staticmethod
-    def add_tables_to_powerpoint(ppt_path, table_details):
-        for slide_number, csv_path, left, top in table_details:
-            try:
-                if not os.path.exists(csv_path):
-                    raise FileNotFoundError(f"CSV file not found: {csv_path}")
-                PowerPointProcess.add_and_format_table_in_powerpoint(ppt_path, slide_number, csv_path, left, top)
-                logging.info(f"Table added to slide {slide_number} from {csv_path}")
-
-            except FileNotFoundError as e:
-                logging.warning(f"Skipping table for slide {slide_number}: {e}")
-            except Exception as e:
-                logging.error(f"An error occurred while adding table to slide {slide_number}: {e}")
-
+import os
+import io
+import shutil
+from pptx import Presentation
+from pptx.util import Inches, Pt
+from pptx.enum.text import PP_ALIGN
+from pptx.dml.color import RGBColor
+import csv
+import logging
+from table_data import Table
+
+# Initialize logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+class PresentationTemplate:
+    """A PowerPoint template read from disk once and kept in memory. Every deck is a fresh copy
+    parsed from the in-memory bytes, and the shapes holding each placeholder are located once
+    so replacements only touch those shapes."""
+
+    def __init__(self, template_path, placeholders=()):
+        if not os.path.exists(template_path):
+            raise FileNotFoundError(f"PowerPoint template not found at {template_path}")
+
+        with open(template_path, 'rb') as template_file:
+            self.template_bytes = template_file.read()
+        self.template_path = template_path
+
+        prs = self.new_presentation()
+        self.slide_count = len(prs.slides)
+        self.placeholder_locations = self.locate_placeholders(prs, placeholders)
+        logging.info(f"Template loaded into memory: {template_path} ({self.slide_count} slides)")
+
+    @staticmethod
+    def locate_placeholders(prs, placeholders):
+        """Map each placeholder text to the (slide index, shape index) pairs whose text contains it"""
+        locations = {placeholder: [] for placeholder in placeholders}
+        for slide_index, slide in enumerate(prs.slides):
+            for shape_index, shape in enumerate(slide.shapes):
+                if not shape.has_text_frame:
+                    continue
+                text = shape.text_frame.text
+                for placeholder in locations:
+                    if placeholder in text:
+                        locations[placeholder].append((slide_index, shape_index))
+        return locations
+
+    def new_presentation(self):
+        return Presentation(io.BytesIO(self.template_bytes))
+
+    def replace_placeholders(self, prs, replacements):
+        """Apply replacements to a copy of this template, using the precomputed shape locations"""
+        for old_text, new_text in replacements.items():
+            locations = self.placeholder_locations.get(old_text)
+            if locations is None:
+                # Not located up front, fall back to scanning every shape
+                PowerPointProcess.replace_text_in_presentation(prs, {old_text: new_text})
+                continue
+            for slide_index, shape_index in locations:
+                PowerPointProcess.replace_text_in_shape(prs.slides[slide_index].shapes[shape_index], old_text, new_text)
+
+
+class PowerPointProcess:
+
+    # Templates already loaded in this process, keyed by path and placeholders
+    _templates = {}
+
+    @staticmethod
+    def load_template(template_path, placeholders=()):
+        """Return the in-memory template for a path, reading and parsing it only on first use"""
+        key = (template_path, tuple(placeholders))
+        template = PowerPointProcess._templates.get(key)
+        if template is None:
+            template = PresentationTemplate(template_path, placeholders)
+            PowerPointProcess._templates[key] = template
+        return template
+
+    @staticmethod
+    def deck_path(destination_path, entity_name, ppt_name):
+        new_file_name = f"{entity_name}_{ppt_name}.pptx"
+        return os.path.join(destination_path, new_file_name)
+
+    @staticmethod
+    def copy_and_rename_ppt(template_path, destination_path, entity_name, ppt_name):
+        try:
+            if not os.path.exists(template_path):
+                raise FileNotFoundError(f"PowerPoint template not found at {template_path}")
+
+            new_file_path = PowerPointProcess.deck_path(destination_path, entity_name, ppt_name)
+            shutil.copy(template_path, new_file_path)
+
+            logging.info(f"Template successfully copied and renamed to {new_file_path}")
+            return new_file_path
+
+        except FileNotFoundError as e:
+            logging.error(f"Error: {e}")
+        except Exception as e:
+            logging.error(f"An unexpected error occurred: {e}")
+
+    @staticmethod
+    def replace_text_in_shape(shape, old_text, new_text):
+        if not shape.has_text_frame:
+            return
+        for paragraph in shape.text_frame.paragraphs:
+            for run in paragraph.runs:
+                if old_text in run.text:
+                    run.text = run.text.replace(old_text, new_text)
+
+    @staticmethod
+    def replace_text_in_presentation(prs, replacements):
+        for slide in prs.slides:
+            for shape in slide.shapes:
+                for old_text, new_text in replacements.items():
+                    PowerPointProcess.replace_text_in_shape(shape, old_text, new_text)
+
+    @staticmethod
+    def replace_text_in_ppt(ppt_path, replacements):
+        try:
+            prs = Presentation(ppt_path)
+            PowerPointProcess.replace_text_in_presentation(prs, replacements)
+            prs.save(ppt_path)
+            logging.info(f"Text replaced in presentation: {ppt_path}")
+
+        except Exception as e:
+            logging.error(f"An error occurred: {e}")
+
+    @staticmethod
+    def read_csv_rows(csv_path):
+        with open(csv_path, newline='') as csvfile:
+            reader = csv.reader(csvfile)
+            return list(reader)
+
+    @staticmethod
+    def add_table_to_slide(slide, data, left, top):
+        """Add a formatted table with the given rows (header first) to an open slide"""
+        rows, cols = len(data), len(data[0])
+
+        # Dynamically adjust font size based on the number of rows
+        font_size = Pt(9) if rows <= 10 else Pt(8) if rows <= 15 else Pt(7)
+
+        # Calculate maximum width required for each column
+        first_col_multiplier = 0.25
+        default_col_multiplier = 0.0  # Adjusted multiplier
+        col_max_widths = [
+            Inches(first_col_multiplier * max(len(row[0]) for row in data) if i == 0 else
+                default_col_multiplier * max(len(row[i]) for row in data))
+            for i in range(cols)
+        ]
+        total_table_width = sum(col_max_widths)
+
+        table = slide.shapes.add_table(rows, cols, Inches(left), Inches(top), total_table_width, Inches(3)).table
+
+        for i, row in enumerate(data):
+            for j, cell_text in enumerate(row):
+                cell = table.cell(i, j)
+                cell.width = col_max_widths[j]
+
+                # Set cell to have no fill (transparent)
+                cell.fill.background()
+
+                para = cell.text_frame.paragraphs[0]
+                run = para.add_run()
+                run.text = cell_text
+                run.font.size = font_size
+
+                # Align the first column left, and others right
+                para.alignment = PP_ALIGN.LEFT if j == 0 else PP_ALIGN.RIGHT
+
+                # Make headers and "Total" cell bold and black
+                if i == 0 or (i == rows - 1 and j == 0):
+                    run.font.bold = True
+                    run.font.color.rgb = RGBColor(0, 0, 0)  # Black color
+
+        return table
+
+    @staticmethod
+    def add_and_format_table_in_powerpoint(ppt_path, slide_number, csv_path, left, top):
+        prs = Presentation(ppt_path)
+        data = PowerPointProcess.read_csv_rows(csv_path)
+        PowerPointProcess.add_table_to_slide(prs.slides[slide_number - 1], data, left, top)
+        prs.save(ppt_path)
+        logging.info(f"Table added to slide {slide_number} in PowerPoint file {ppt_path}")
+
+    @staticmethod
+    def add_tables_to_presentation(prs, table_details):
+        """Add tables to an open presentation. The source of each table is an in-memory Table or a CSV path"""
+        for slide_number, source, left, top in table_details:
+            try:
+                if isinstance(source, Table):
+                    if not source:
+                        logging.warning(f"Skipping table for slide {slide_number}: no data")
+                        continue
+                    data = source.as_text_rows()
+                    source_name = "in-memory table"
+                else:
+                    if not os.path.exists(source):
+                        raise FileNotFoundError(f"CSV file not found: {source}")
+                    data = PowerPointProcess.read_csv_rows(source)
+                    source_name = source
+                PowerPointProcess.add_table_to_slide(prs.slides[slide_number - 1], data, left, top)
+                logging.info(f"Table added to slide {slide_number} from {source_name}")
+
+            except FileNotFoundError as e:
+                logging.warning(f"Skipping table for slide {slide_number}: {e}")
+            except Exception as e:
+                logging.error(f"An error occurred while adding table to slide {slide_number}: {e}")
+
+    @staticmethod
+    def add_tables_to_powerpoint(ppt_path, table_details):
+        for slide_number, csv_path, left, top in table_details:
+            try:
+                if not os.path.exists(csv_path):
+                    raise FileNotFoundError(f"CSV file not found: {csv_path}")
+                PowerPointProcess.add_and_format_table_in_powerpoint(ppt_path, slide_number, csv_path, left, top)
+                logging.info(f"Table added to slide {slide_number} from {csv_path}")
+
+            except FileNotFoundError as e:
+                logging.warning(f"Skipping table for slide {slide_number}: {e}")
+            except Exception as e:
+                logging.error(f"An error occurred while adding table to slide {slide_number}: {e}")
+
+    @staticmethod
+    def build_deck_from_template(template, destination_path, entity_name, ppt_name, replacements, table_details):
+        """Create an entity's deck from an in-memory template: copy, replace text, add tables and
+        write it straight to its destination. Returns the path of the new deck."""
+        ppt_path = PowerPointProcess.deck_path(destination_path, entity_name, ppt_name)
+        prs = template.new_presentation()
+        template.replace_placeholders(prs, replacements)
+        PowerPointProcess.add_tables_to_presentation(prs, table_details)
+        prs.save(ppt_path)
+        logging.info(f"Deck built from in-memory template: {ppt_path}")
+        return ppt_path
@@ -0,0 +1,58 @@
+import configparser
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class ReportConfig:
+    """Paths, slide numbers and run settings of the report job, read from an INI file
+    (see report_config.example.ini). Every key is optional; missing keys keep the defaults below."""
+
+    # Slide of each report table in the deck template, in table order
+    DEFAULT_SLIDES = {
+        'log_source_overview': 17,  # Log Source Overview
+        'log_volume': 18,           # MPS/Log Volume
+        'missing_logs': 19,         # Missing Logs/SLS Alarms
+        'pending_log_sources': 20   # Pending Logs
+    }
+
+    def __init__(self):
+        # [paths]
+        self.output_directory = "Z:/Final Project/Data_export_tests"
+        self.template_path = "Z:/Final Project/Powerpoint Template/Statusmøde, Q3DIRTogMDR.pptx"
+
+        # [report]
+        self.ppt_name = "Q3DIRTogMDR"
+        self.slides = dict(self.DEFAULT_SLIDES)
+
+        # [run] - entity filter used when none is given on the command line (empty: interactive menu)
+        self.entities = []
+        self.workers = 1
+        self.entity_deadline = 30 * 60
+        self.order = 'size'
+        self.bulk = 'auto'
+
+    @classmethod
+    def load(cls, path):
+        config = cls()
+        parser = configparser.ConfigParser(interpolation=None)
+        with open(path, encoding='utf-8') as config_file:
+            parser.read_file(config_file)
+
+        config.output_directory = parser.get('paths', 'output_directory', fallback=config.output_directory)
+        config.template_path = parser.get('paths', 'template_path', fallback=config.template_path)
+
+        config.ppt_name = parser.get('report', 'ppt_name', fallback=config.ppt_name)
+        for table in config.slides:
+            config.slides[table] = parser.getint('slides', table, fallback=config.slides[table])
+
+        entities = parser.get('run', 'entities', fallback='')
+        config.entities = [pattern.strip() for pattern in entities.replace('\n', ',').split(',') if pattern.strip()]
+        config.workers = parser.getint('run', 'workers', fallback=config.workers)
+        config.entity_deadline = parser.getfloat('run', 'entity_deadline', fallback=config.entity_deadline)
+        config.order = parser.get('run', 'order', fallback=config.order)
+        config.bulk = parser.get('run', 'bulk', fallback=config.bulk)
+
+        logging.info(f"Loaded report configuration from {path}")
+        return config
@@ -0,0 +1,160 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class ResponseCache:
+    """Persistent cache of GET responses in a SQLite file, keyed by URL plus params.
+    Only endpoints listed in ttls are cached. Expired entries are revalidated with
+    If-None-Match / If-Modified-Since when the server sent an ETag or Last-Modified.
+    The file is kept under max_bytes by evicting the least recently used entries."""
+
+    # Time to live in seconds per endpoint path prefix (slow-changing endpoints only)
+    DEFAULT_TTLS = {
+        'entities/': 24 * 3600,
+        'logsources/': 12 * 3600,
+        'hosts/': 12 * 3600
+    }
+
+    def __init__(self, path, ttls=None, max_bytes=200 * 1024 * 1024):
+        self.path = path
+        self.ttls = dict(self.DEFAULT_TTLS if ttls is None else ttls)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Generous busy timeout, the report workers write to the same file
+        self.connection = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                body BLOB NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL
+            )""")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+        self.connection.commit()
+        logging.info(f"Using response cache at {path}")
+
+    def close(self):
+        with self._lock:
+            self.connection.close()
+
+    def ttl_for(self, endpoint):
+        """Return the TTL of an endpoint, or None if it must not be cached"""
+        path = urlsplit(endpoint).path.lstrip('/')
+        for prefix, ttl in self.ttls.items():
+            if path == prefix or path.startswith(prefix):
+                return ttl
+        return None
+
+    @staticmethod
+    def make_key(url, params=None):
+        return f"{url}|{json.dumps(params, sort_keys=True, default=str)}"
+
+    def get(self, key):
+        """Return the cached entry for a key (marking it as recently used) or None. A cache that cannot be
+        read (e.g. still locked by another worker) is treated as a miss"""
+        try:
+            with self._lock:
+                row = self.connection.execute(
+                    "SELECT body, etag, last_modified, stored_at FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                self.connection.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+                self.connection.commit()
+        except sqlite3.Error as e:
+            logging.warning(f"Response cache read failed, treating it as a miss: {e}")
+            self.rollback()
+            return None
+
+        body, etag, last_modified, stored_at = row
+        return {
+            'data': json.loads(body),
+            'etag': etag,
+            'last_modified': last_modified,
+            'stored_at': stored_at
+        }
+
+    @staticmethod
+    def is_fresh(entry, ttl):
+        return time.time() - entry['stored_at'] < ttl
+
+    @staticmethod
+    def conditional_headers(entry):
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def put(self, key, url, body, etag=None, last_modified=None):
+        """Store a response. Failing to write the cache only costs a later refetch, so it never fails the call"""
+        now = time.time()
+        try:
+            with self._lock:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO responses (key, url, body, etag, last_modified, stored_at, accessed_at, size) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, url, body, etag, last_modified, now, now, len(body)))
+                self.connection.commit()
+            self.evict()
+        except sqlite3.Error as e:
+            logging.warning(f"Response cache write failed for {url}: {e}")
+            self.rollback()
+
+    def touch(self, key):
+        """Mark an entry as fresh again after the server answered 304 Not Modified"""
+        now = time.time()
+        try:
+            with self._lock:
+                self.connection.execute("UPDATE responses SET stored_at = ?, accessed_at = ? WHERE key = ?", (now, now, key))
+                self.connection.commit()
+        except sqlite3.Error as e:
+            logging.warning(f"Response cache update failed: {e}")
+            self.rollback()
+
+    def rollback(self):
+        """End the transaction a failed statement may have left open"""
+        with self._lock:
+            try:
+                self.connection.rollback()
+            except sqlite3.Error:
+                pass
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes"""
+        with self._lock:
+            total = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+
+            evicted = 0
+            rows = self.connection.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall()
+            for key, size in rows:
+                if total <= self.max_bytes:
+                    break
+                self.connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                total -= size
+                evicted += 1
+            self.connection.commit()
+        logging.info(f"Evicted {evicted} entries from response cache")
+
+    def clear(self):
+        with self._lock:
+            self.connection.execute("DELETE FROM responses")
+            self.connection.commit()
@@ -0,0 +1,85 @@
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter for one endpoint family (admin, metrics, alarm).
+    A server Retry-After takes precedence over the computed delay, and no retry is scheduled
+    once max_retries is reached or the next wait would exceed max_total_time."""
+
+    RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+    def __init__(self, max_retries=4, base_delay=0.5, max_delay=30.0, max_total_time=120.0, jitter=True):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_total_time = max_total_time
+        self.jitter = jitter
+
+    def is_retryable_status(self, status_code):
+        return status_code in self.RETRY_STATUS_CODES
+
+    def delay_for(self, attempt, retry_after=None, elapsed=0.0):
+        """Seconds to wait before retrying after failed attempt number attempt (0-based), or None to give up"""
+        if attempt >= self.max_retries:
+            return None
+
+        if retry_after is not None:
+            delay = min(max(retry_after, 0.0), self.max_delay)
+        else:
+            delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+            if self.jitter:
+                delay = random.uniform(0, delay)
+
+        if elapsed + delay > self.max_total_time:
+            return None
+        return delay
+
+    @staticmethod
+    def parse_retry_after(value):
+        """Parse a Retry-After header (seconds or HTTP date) into seconds, None if absent or invalid"""
+        if not value:
+            return None
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+class TokenBucket:
+    """Client-side rate limiter shared by all threads of a handler: rate requests per second
+    on average, with bursts of up to capacity requests."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Take one token and return how many seconds the caller must wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
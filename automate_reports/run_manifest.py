@@ -0,0 +1,114 @@
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class RunManifest:
+    """Checkpoints of a multi-entity run in a SQLite file: the selected entities, which stages each
+    entity has completed and the payloads needed to pick up after a stage (the raw API data after
+    'fetched', the processed tables after 'processed'). Worker processes open their own connection
+    to the same file, so every entity checkpoints as soon as a stage is done."""
+
+    # Per entity stages in pipeline order
+    STAGES = ('fetched', 'processed', 'csv_written', 'rendered')
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Generous busy timeout, the report workers write to the same file
+        self.connection = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS run (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS stages (
+                entity TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                completed_at REAL NOT NULL,
+                detail TEXT,
+                PRIMARY KEY (entity, stage)
+            );
+            CREATE TABLE IF NOT EXISTS payloads (
+                entity TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                body BLOB NOT NULL,
+                PRIMARY KEY (entity, kind)
+            );""")
+        self.connection.commit()
+
+    def close(self):
+        with self._lock:
+            self.connection.close()
+
+    def reset(self, selected_entities, total_entities=None):
+        """Start a new run: forget all checkpoints and record the selected entities (and how many entities
+        there were to select from)"""
+        with self._lock:
+            self.connection.execute("DELETE FROM run")
+            self.connection.execute("DELETE FROM stages")
+            self.connection.execute("DELETE FROM payloads")
+            self.connection.executemany("INSERT INTO run (key, value) VALUES (?, ?)", [
+                ('started_at', json.dumps(time.time())),
+                ('selected_entities', json.dumps(selected_entities)),
+                ('total_entities', json.dumps(total_entities))
+            ])
+            self.connection.commit()
+        logging.info(f"Started run manifest {self.path} for {len(selected_entities)} entities")
+
+    def run_value(self, key):
+        with self._lock:
+            row = self.connection.execute("SELECT value FROM run WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def selected_entities(self):
+        """Entities of the recorded run, or None if the manifest is empty"""
+        return self.run_value('selected_entities')
+
+    #######################################################################################################################################################################
+    #######################################################################################################################################################################
+
+    def stages(self, entity):
+        """Completed stages of an entity as {stage: detail}"""
+        with self._lock:
+            rows = self.connection.execute("SELECT stage, detail FROM stages WHERE entity = ?", (entity,)).fetchall()
+        return dict(rows)
+
+    def mark(self, entity, stage, detail=None):
+        with self._lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO stages (entity, stage, completed_at, detail) VALUES (?, ?, ?, ?)",
+                (entity, stage, time.time(), detail))
+            self.connection.commit()
+
+    def is_complete(self, entity, required=STAGES):
+        stages = self.stages(entity)
+        return all(stage in stages for stage in required)
+
+    def save_payload(self, entity, kind, data):
+        """Store a payload compressed. Raw API data is kept as JSON, anything else (processed tables) is pickled"""
+        body = b'J' + json.dumps(data).encode('utf-8') if kind == 'raw' else b'P' + pickle.dumps(data)
+        with self._lock:
+            self.connection.execute("INSERT OR REPLACE INTO payloads (entity, kind, body) VALUES (?, ?, ?)",
+                                    (entity, kind, zlib.compress(body)))
+            self.connection.commit()
+
+    def load_payload(self, entity, kind):
+        with self._lock:
+            row = self.connection.execute("SELECT body FROM payloads WHERE entity = ? AND kind = ?", (entity, kind)).fetchone()
+        if row is None:
+            return None
+        body = zlib.decompress(row[0])
+        return json.loads(body[1:]) if body[:1] == b'J' else pickle.loads(body[1:])
@@ -0,0 +1,118 @@
+import gzip
+import hashlib
+import json
+import logging
+import lzma
+import os
+import re
+import threading
+from datetime import date, datetime
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+DATE_PATTERN = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+
+class SnapshotStore:
+    """Record/replay store of raw API payloads for one run.
+
+    Every successful response is written once to objects/<sha256[:2]>/<sha256>.json.gz (or .json.xz),
+    addressed by the hash of its canonical JSON, so identical payloads are stored once. index.jsonl maps
+    each request (endpoint family, method, endpoint and params) to its payload. In replay mode the same
+    requests are answered from the directory without touching the network."""
+
+    COMPRESSIONS = {
+        'gzip': (gzip, '.json.gz'),
+        'lzma': (lzma, '.json.xz')
+    }
+
+    def __init__(self, directory, mode='record', compression='gzip'):
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"Unknown snapshot mode: {mode}")
+        if compression not in self.COMPRESSIONS:
+            raise ValueError(f"Unknown snapshot compression: {compression}")
+        self.directory = directory
+        self.mode = mode
+        self.compression = compression
+        self.index = {}
+        self._lock = threading.Lock()
+
+        if mode == 'replay':
+            self.load_index()
+            logging.info(f"Replaying {len(self.index)} API responses from snapshot {directory}")
+        else:
+            os.makedirs(os.path.join(directory, 'objects'), exist_ok=True)
+            info_path = os.path.join(directory, 'snapshot.json')
+            if not os.path.exists(info_path):
+                with open(info_path, 'w', encoding='utf-8') as info_file:
+                    json.dump({'created_at': datetime.now().isoformat(timespec='seconds'), 'compression': compression}, info_file, indent=2)
+            self.load_index()
+            logging.info(f"Recording API responses to snapshot {directory}")
+
+    @property
+    def replay(self):
+        return self.mode == 'replay'
+
+    def load_index(self):
+        index_path = os.path.join(self.directory, 'index.jsonl')
+        if not os.path.exists(index_path):
+            if self.replay:
+                raise FileNotFoundError(f"No snapshot index in {self.directory}")
+            return
+        with open(index_path, encoding='utf-8') as index_file:
+            for line in index_file:
+                if line.strip():
+                    entry = json.loads(line)
+                    self.index[entry['key']] = entry['file']
+
+    @staticmethod
+    def make_key(family, method, endpoint, params=None):
+        """Request key. Dates are stored relative to today (@0d is today, @7d a week ago), so a snapshot
+        recorded last night still matches the date-based requests made when it is replayed."""
+        today = date.today()
+
+        def relative(match):
+            try:
+                return f"@{(today - date.fromisoformat(match.group(0))).days}d"
+            except ValueError:
+                return match.group(0)
+
+        request = f"{family} {method.upper()} {endpoint} {json.dumps(params, sort_keys=True, default=str)}"
+        return DATE_PATTERN.sub(relative, request)
+
+    #######################################################################################################################################################################
+    #######################################################################################################################################################################
+
+    def record(self, family, method, endpoint, params, data):
+        key = self.make_key(family, method, endpoint, params)
+        body = json.dumps(data, sort_keys=True, separators=(',', ':')).encode('utf-8')
+        digest = hashlib.sha256(body).hexdigest()
+        module, extension = self.COMPRESSIONS[self.compression]
+        relative_path = os.path.join('objects', digest[:2], digest + extension)
+
+        with self._lock:
+            if self.index.get(key) == relative_path:
+                return
+            path = os.path.join(self.directory, relative_path)
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # Write next to the target and rename, so a crash never leaves a truncated object behind
+                temp_path = f"{path}.{os.getpid()}.tmp"
+                with module.open(temp_path, 'wb') as object_file:
+                    object_file.write(body)
+                os.replace(temp_path, path)
+            with open(os.path.join(self.directory, 'index.jsonl'), 'a', encoding='utf-8') as index_file:
+                index_file.write(json.dumps({'key': key, 'file': relative_path}) + '\n')
+            self.index[key] = relative_path
+
+    def get(self, family, method, endpoint, params=None):
+        """Return (payload, None), or (None, error message) when the request is not in the snapshot"""
+        key = self.make_key(family, method, endpoint, params)
+        relative_path = self.index.get(key)
+        if relative_path is None:
+            return None, f"Replay Error: no snapshot of {method.upper()} {endpoint}"
+
+        module = gzip if relative_path.endswith('.gz') else lzma
+        with module.open(os.path.join(self.directory, relative_path), 'rb') as object_file:
+            return json.loads(object_file.read()), None
@@ -0,0 +1,135 @@
+from dataclasses import dataclass, fields
+
+
+def format_thousands(value):
+    """Render integers with thousands separators (1,234,567); anything else as plain text"""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return f"{value:,}"
+    return Table.format_value(value)
+
+
+def format_percent(value):
+    """Render a percentage change with its sign (+12.3%); None as an empty cell"""
+    if value is None:
+        return ''
+    return f"{value:+.1f}%"
+
+
+class Table:
+    """In-memory table (header plus typed rows) passed from DataProcessor to PowerPointProcess,
+    ExcelOperations and the optional CSV export. Rows are either plain lists or compact record
+    objects (see the dataclasses below); values stay raw until the table is rendered."""
+
+    __slots__ = ('header', 'rows', 'fields', 'formats')
+
+    def __init__(self, header=None, rows=None, fields=None, formats=None):
+        self.header = list(header or [])
+        self.rows = list(rows or [])
+        # Attribute names when rows are record objects, None when rows are lists
+        self.fields = list(fields) if fields else None
+        # Per-column render function, None for plain text
+        self.formats = list(formats) if formats else [None] * len(self.header)
+
+    @classmethod
+    def from_records(cls, records):
+        """Build a table from a list of dicts that all share the keys of the first one"""
+        if not records:
+            return cls()
+        header = list(records[0].keys())
+        return cls(header, [[record.get(column) for column in header] for record in records])
+
+    @classmethod
+    def from_rows(cls, record_type, rows):
+        """Build a table from record objects of one of the record dataclasses"""
+        return cls(record_type.HEADER, rows, [field.name for field in fields(record_type)], record_type.FORMATS)
+
+    def row_values(self, row):
+        if self.fields is None:
+            return list(row)
+        return [getattr(row, field) for field in self.fields]
+
+    def values(self):
+        """Rows as lists of raw (typed) values"""
+        return [self.row_values(row) for row in self.rows]
+
+    def to_records(self):
+        return [dict(zip(self.header, values)) for values in self.values()]
+
+    @staticmethod
+    def format_value(value):
+        # Same text csv.DictWriter would write, so rendering from memory matches the CSV round trip
+        return '' if value is None else str(value)
+
+    def as_text_rows(self):
+        """Header plus rows as lists of strings, ready to be rendered"""
+        formats = [fmt or self.format_value for fmt in self.formats]
+        return [list(self.header)] + [[fmt(value) for fmt, value in zip(formats, values)] for values in self.values()]
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __bool__(self):
+        return bool(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __repr__(self):
+        return f"Table(header={self.header!r}, rows={len(self.rows)})"
+
+
+#######################################################################################################################################################################
+#######################################################################################################################################################################
+
+# Compact typed rows produced by DataProcessor. HEADER holds the display names and FORMATS the render
+# function of each column, in field order. Numbers stay ints until the table is rendered.
+
+@dataclass(slots=True)
+class LogSourceCountRow:
+    HEADER = ('Log Source Type', 'Count')
+    FORMATS = (None, None)
+
+    log_source_type: str
+    count: int
+
+
+@dataclass(slots=True)
+class LogVolumeRow:
+    HEADER = ('Log Source Type', 'Logs Count', 'Logs/D', 'Logs/S')
+    FORMATS = (None, format_thousands, format_thousands, format_thousands)
+
+    log_source_type: str
+    logs_count: int
+    logs_per_day: int
+    logs_per_sec: int
+
+
+@dataclass(slots=True)
+class LogVolumeTrendRow:
+    HEADER = ('Week', 'Logs Count', 'Logs/D', 'Logs/S', 'Change')
+    FORMATS = (None, format_thousands, format_thousands, format_thousands, format_percent)
+
+    week: str
+    logs_count: object  # None on the growth row
+    logs_per_day: object
+    logs_per_sec: object
+    change: object  # Percent change of Logs/D from the previous week, or the MPS growth over the whole trend
+
+
+@dataclass(slots=True)
+class MissingLogRow:
+    HEADER = ('Log Source Name', 'Log Source Host Name', 'Log Date')
+    FORMATS = (None, None, None)
+
+    log_source_name: str
+    log_source_host_name: str
+    log_date: object  # Timestamp as returned by the API, or the alarm count on the total row
+
+
+@dataclass(slots=True)
+class PendingLogSourceRow:
+    HEADER = ('Log Source Name', 'IP Addresses')
+    FORMATS = (None, None)
+
+    log_source_name: str
+    ip_addresses: object  # IP address(es) as returned by the API, or the count on the total row
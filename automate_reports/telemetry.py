@@ -0,0 +1,209 @@
+import json
+import logging
+import os
+import re
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, float('inf'))
+
+# Calls made outside any entity report (entity list, bulk fetches) are booked on this entity
+RUN_ENTITY = '_run'
+
+
+def endpoint_name(family, endpoint):
+    """Endpoint label such as 'alarm:alarms/{id}/events' - query string dropped, IDs collapsed"""
+    path = endpoint.split('?')[0].strip('/')
+    path = re.sub(r'(^|/)\d+(?=/|$)', r'\1{id}', path)
+    return f"{family}:{path}"
+
+
+class EndpointStats:
+
+    __slots__ = ('requests', 'errors', 'retries', 'hedges', 'bytes', 'pages', 'latency_sum', 'latency_buckets')
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.hedges = 0
+        self.bytes = 0
+        self.pages = 0
+        self.latency_sum = 0.0
+        self.latency_buckets = [0] * len(LATENCY_BUCKETS)
+
+    def as_dict(self):
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'retries': self.retries,
+            'hedges': self.hedges,
+            'bytes': self.bytes,
+            'pages': self.pages,
+            'latency_sum': self.latency_sum,
+            'latency_buckets': list(self.latency_buckets)
+        }
+
+    def merge(self, stats):
+        self.requests += stats['requests']
+        self.errors += stats['errors']
+        self.retries += stats['retries']
+        self.hedges += stats['hedges']
+        self.bytes += stats['bytes']
+        self.pages += stats['pages']
+        self.latency_sum += stats['latency_sum']
+        self.latency_buckets = [a + b for a, b in zip(self.latency_buckets, stats['latency_buckets'])]
+
+
+class APITelemetry:
+    """Per entity and per endpoint API counters: requests, latency histogram, response bytes,
+    pages walked, retries, hedged duplicates and errors. Written at the end of a run as a JSON summary and as a
+    Prometheus textfile-collector export."""
+
+    def __init__(self):
+        self.stats = {}
+        self.current_entity = RUN_ENTITY
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def entity_scope(self, entity):
+        """Book every call made inside the block on entity (one report at a time per handler)"""
+        previous = self.current_entity
+        self.current_entity = entity
+        try:
+            yield
+        finally:
+            self.current_entity = previous
+
+    def _stats(self, endpoint, entity=None):
+        key = (entity or self.current_entity, endpoint)
+        stats = self.stats.get(key)
+        if stats is None:
+            stats = self.stats[key] = EndpointStats()
+        return stats
+
+    def record_request(self, endpoint, seconds, response_bytes=0, entity=None):
+        """Count one request sent. entity books it on an entity other than the current one (a hedged
+        duplicate that finishes after its report moved on)"""
+        with self._lock:
+            stats = self._stats(endpoint, entity)
+            stats.requests += 1
+            stats.bytes += response_bytes
+            stats.latency_sum += seconds
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    stats.latency_buckets[index] += 1
+                    break
+
+    def record_error(self, endpoint):
+        with self._lock:
+            self._stats(endpoint).errors += 1
+
+    def record_retry(self, endpoint):
+        with self._lock:
+            self._stats(endpoint).retries += 1
+
+    def record_hedge(self, endpoint):
+        with self._lock:
+            self._stats(endpoint).hedges += 1
+
+    def record_page(self, endpoint):
+        with self._lock:
+            self._stats(endpoint).pages += 1
+
+    #######################################################################################################################################################################
+    #######################################################################################################################################################################
+
+    def snapshot(self, entity=None):
+        """Plain-dict copy of the counters ({entity: {endpoint: stats}}), optionally for one entity only"""
+        with self._lock:
+            result = {}
+            for (stats_entity, endpoint), stats in self.stats.items():
+                if entity is None or stats_entity == entity:
+                    result.setdefault(stats_entity, {})[endpoint] = stats.as_dict()
+            return result
+
+    def merge(self, snapshot):
+        """Add counters collected elsewhere (e.g. by a worker process)"""
+        with self._lock:
+            for entity, endpoints in snapshot.items():
+                for endpoint, stats in endpoints.items():
+                    key = (entity, endpoint)
+                    if key not in self.stats:
+                        self.stats[key] = EndpointStats()
+                    self.stats[key].merge(stats)
+
+    def summary(self):
+        """Snapshot plus totals per endpoint and per entity"""
+        by_entity = self.snapshot()
+        by_endpoint = {}
+        entity_totals = {}
+        for entity, endpoints in by_entity.items():
+            for endpoint, stats in endpoints.items():
+                for totals, key in ((by_endpoint, endpoint), (entity_totals, entity)):
+                    total = totals.setdefault(key, EndpointStats())
+                    total.merge(stats)
+
+        return {
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'latency_buckets': [str(bound) for bound in LATENCY_BUCKETS],
+            'endpoints': {endpoint: stats.as_dict() for endpoint, stats in sorted(by_endpoint.items())},
+            'entities': {entity: stats.as_dict() for entity, stats in sorted(entity_totals.items())},
+            'by_entity': by_entity
+        }
+
+    def write_json(self, path):
+        with open(path, 'w', encoding='utf-8') as json_file:
+            json.dump(self.summary(), json_file, indent=2)
+        logging.info(f"API telemetry summary written to {path}")
+
+    @staticmethod
+    def _label(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    def prometheus_text(self):
+        counters = (
+            ('requests', 'automate_reports_api_requests_total', 'API requests sent'),
+            ('errors', 'automate_reports_api_errors_total', 'API calls that failed after all retries'),
+            ('retries', 'automate_reports_api_retries_total', 'API request retries'),
+            ('hedges', 'automate_reports_api_hedges_total', 'Duplicate requests sent to hedge slow calls'),
+            ('bytes', 'automate_reports_api_response_bytes_total', 'Response body bytes received'),
+            ('pages', 'automate_reports_api_pages_total', 'Result pages walked')
+        )
+        snapshot = self.snapshot()
+        series = [(entity, endpoint, stats) for entity, endpoints in sorted(snapshot.items()) for endpoint, stats in sorted(endpoints.items())]
+
+        lines = []
+        for field, metric, help_text in counters:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            for entity, endpoint, stats in series:
+                lines.append(f'{metric}{{entity="{self._label(entity)}",endpoint="{self._label(endpoint)}"}} {stats[field]}')
+
+        metric = 'automate_reports_api_request_duration_seconds'
+        lines.append(f"# HELP {metric} API request latency")
+        lines.append(f"# TYPE {metric} histogram")
+        for entity, endpoint, stats in series:
+            labels = f'entity="{self._label(entity)}",endpoint="{self._label(endpoint)}"'
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, stats['latency_buckets']):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{metric}_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f'{metric}_sum{{{labels}}} {stats["latency_sum"]}')
+            lines.append(f'{metric}_count{{{labels}}} {stats["requests"]}')
+
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        # Write to a temporary file first so node_exporter never reads a half-written file
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as prom_file:
+            prom_file.write(self.prometheus_text())
+        os.replace(temp_path, path)
+        logging.info(f"API telemetry Prometheus export written to {path}")